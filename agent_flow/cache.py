@@ -1,72 +1,427 @@
 import redis
+import redis.asyncio as aioredis
 import os
 import json
-from typing import Optional, Any
+import logging
+import time
+import asyncio
+from collections import OrderedDict, defaultdict
+from urllib.parse import quote
+from typing import Optional, Any, Awaitable, Callable, Dict, List, Tuple
 from dotenv import load_dotenv
+from .metrics import track_dependency
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "10000"))
+LOCAL_CACHE_TTL_SECONDS = int(os.getenv("LOCAL_CACHE_TTL_SECONDS", "300"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "2"))
+REDIS_RECONNECT_MIN_DELAY_SECONDS = 1
+REDIS_RECONNECT_MAX_DELAY_SECONDS = 60
+
+# Stored in place of a value to remember that a lookup found nothing
+NEGATIVE_ENTRY = {"__negative__": True}
+
+
+def redis_connection_kwargs() -> Optional[Dict[str, Any]]:
+    """Connection arguments from the environment, or None if Redis is not configured."""
+    host = os.getenv("REDIS_HOST")
+    port = os.getenv("REDIS_PORT")
+    password = os.getenv("REDIS_PASSWORD")
+
+    if not (host and port):
+        return None
+
+    is_local = host == "localhost" or host == "127.0.0.1"
+
+    # Base connection arguments
+    connection_kwargs = {
+        "host": host,
+        "port": int(port),
+        "decode_responses": True,
+    }
+
+    # Add production-only arguments
+    if not is_local:
+        connection_kwargs["password"] = password
+        # connection_kwargs["ssl"] = True
+        # connection_kwargs["ssl_cert_reqs"] = None
+
+    return connection_kwargs
+
+
+def redis_url(db: int = 0) -> Optional[str]:
+    """The same connection as a redis:// URL, for clients configured by URL."""
+    connection_kwargs = redis_connection_kwargs()
+    if not connection_kwargs:
+        return None
+
+    password = connection_kwargs.get("password")
+    auth = f":{quote(password, safe='')}@" if password else ""
+    return f"redis://{auth}{connection_kwargs['host']}:{connection_kwargs['port']}/{db}"
+
 
 class RedisCache:
+    """
+    asyncio Redis client over a shared connection pool.
+
+    The cache starts out unavailable and connects on first use (or via
+    `connect()` at startup). Whenever Redis cannot be reached, operations
+    degrade to cache misses and a background task keeps retrying with
+    exponential backoff until the connection is back.
+    """
+
     def __init__(self):
-        self.client = None
-        host = os.getenv("REDIS_HOST")
-        port = os.getenv("REDIS_PORT")
-        password = os.getenv("REDIS_PASSWORD")
-
-        if host and port:
-            is_local = host == "localhost" or host == "127.0.0.1"
-
-            # Base connection arguments
-            connection_kwargs = {
-                "host": host,
-                "port": int(port),
-                "decode_responses": True,
-            }
-
-            # Add production-only arguments
-            if not is_local:
-                connection_kwargs["password"] = password
-                # connection_kwargs["ssl"] = True
-                # connection_kwargs["ssl_cert_reqs"] = None
+        self.client: Optional[aioredis.Redis] = None
+        self.available = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+        connection_kwargs = redis_connection_kwargs()
+        if connection_kwargs:
+            pool = aioredis.ConnectionPool(
+                **connection_kwargs,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+                socket_connect_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+                health_check_interval=30,
+            )
+            self.client = aioredis.Redis(connection_pool=pool)
+            logger.info(
+                "Redis cache configured for %s:%s.",
+                connection_kwargs["host"],
+                connection_kwargs["port"],
+            )
+        else:
+            logger.info("Redis credentials not found. Caching will be disabled.")
+
+    async def connect(self) -> bool:
+        """Ping Redis once; on failure, schedule background reconnection."""
+        if not self.client:
+            return False
 
+        try:
+            await self.client.ping()
+            if not self.available:
+                logger.info("Successfully connected to Redis.")
+            self.available = True
+        except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError) as e:
+            logger.warning(
+                "Could not connect to Redis. Caching is disabled until it reconnects. "
+                "Error: %s",
+                e,
+            )
+            self._mark_unavailable()
+        return self.available
+
+    def _mark_unavailable(self):
+        self.available = False
+        if self._reconnect_task is None or self._reconnect_task.done():
             try:
-                print(
-                    f"Attempting to connect to Redis ({'local' if is_local else 'cloud'}) at {host}:{port}..."
+                self._reconnect_task = asyncio.get_running_loop().create_task(
+                    self._reconnect()
                 )
-                self.client = redis.Redis(**connection_kwargs)
-                self.client.ping()
-                print("Successfully connected to Redis.")
-            except redis.exceptions.ConnectionError as e:
-                print(
-                    f"Could not connect to Redis. Caching will be disabled. Error: {e}"
+            except RuntimeError:
+                # No running loop; the next call from async code will retry
+                self._reconnect_task = None
+
+    async def _reconnect(self):
+        delay = REDIS_RECONNECT_MIN_DELAY_SECONDS
+        while not self.available:
+            await asyncio.sleep(delay)
+            try:
+                await self.client.ping()
+                self.available = True
+                logger.info("Reconnected to Redis.")
+            except Exception as e:
+                delay = min(delay * 2, REDIS_RECONNECT_MAX_DELAY_SECONDS)
+                logger.warning(
+                    "Redis still unavailable, retrying in %ss. Error: %s", delay, e
                 )
-                self.client = None
-        else:
-            print("Redis credentials not found. Caching will be disabled.")
 
-    def get(self, key: str) -> Optional[Any]:
+    async def _ready(self) -> bool:
         if not self.client:
+            return False
+        if not self.available and self._reconnect_task is None:
+            # First use: connect inline rather than waiting for a backoff cycle
+            return await self.connect()
+        return self.available
+
+    def _handle_error(self, action: str, e: Exception):
+        logger.warning("Error %s Redis: %s", action, e)
+        if isinstance(
+            e, (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+        ):
+            self._mark_unavailable()
+
+    async def close(self):
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+        if self.client:
+            await self.client.aclose()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not await self._ready():
             return None
 
         try:
-            value = self.client.get(key)
+            with track_dependency("redis"):
+                value = await self.client.get(key)
             if value is not None:
                 return json.loads(value)
             return None
         except Exception as e:
-            print(f"Error retrieving key '{key}' from Redis: {e}")
+            self._handle_error(f"retrieving key '{key}' from", e)
             return None
 
-    def set(self, key: str, value: Any, expire: Optional[int] = None):
-        if not self.client:
+    async def set(self, key: str, value: Any, expire: Optional[int] = None):
+        if not await self._ready():
+            return
+
+        try:
+            # ex=None stores the key without an expiry
+            with track_dependency("redis"):
+                await self.client.set(key, json.dumps(value), ex=expire)
+        except Exception as e:
+            self._handle_error(f"setting key '{key}' in", e)
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Fetch several keys in one round trip; missing keys come back as None."""
+        if not keys or not await self._ready():
+            return [None] * len(keys)
+
+        try:
+            with track_dependency("redis"):
+                values = await self.client.mget(keys)
+            return [
+                json.loads(value) if value is not None else None for value in values
+            ]
+        except Exception as e:
+            self._handle_error(f"retrieving {len(keys)} keys from", e)
+            return [None] * len(keys)
+
+    async def mset(self, mapping: Dict[str, Any], expire: Optional[int] = None):
+        """Write several keys in one pipelined round trip."""
+        if not mapping or not await self._ready():
             return
 
         try:
-            value_str = json.dumps(value)
-            self.client.setex(key, expire, value_str)
+            async with self.pipeline() as pipe:
+                for key, value in mapping.items():
+                    pipe.set(key, json.dumps(value), ex=expire)
+                with track_dependency("redis"):
+                    await pipe.execute()
         except Exception as e:
-            print(f"Error setting key '{key}' in Redis: {e}")
+            self._handle_error(f"setting {len(mapping)} keys in", e)
+
+    def pipeline(self):
+        """A non-transactional pipeline for batching arbitrary commands."""
+        return self.client.pipeline(transaction=False)
+
+
+class LocalCache:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int, on_evict: Callable[[str], None]):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: float):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted_key, _ = self._entries.popitem(last=False)
+            self.on_evict(evicted_key)
+
+
+def _namespace(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class TieredCache:
+    """
+    In-process LRU/TTL tier in front of Redis.
+
+    Values found in Redis are promoted into the local tier. `None` results can
+    be cached as negative entries with their own (short) TTL, and concurrent
+    fetches of the same missing key are collapsed into one (single-flight).
+    Hit/miss/eviction counters are kept per key namespace (the prefix before
+    the first ':').
+    """
+
+    def __init__(
+        self,
+        backend: RedisCache,
+        max_entries: int = LOCAL_CACHE_MAX_ENTRIES,
+        local_ttl: int = LOCAL_CACHE_TTL_SECONDS,
+    ):
+        self.backend = backend
+        self.local_ttl = local_ttl
+        self.local = LocalCache(max_entries, on_evict=self._count_eviction)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, key: str, counter: str, amount: int = 1):
+        self._stats[_namespace(key)][counter] += amount
+
+    def _count_eviction(self, key: str):
+        self._count(key, "evictions")
+
+    def _local_ttl(self, expire: Optional[int]) -> float:
+        return min(expire, self.local_ttl) if expire else self.local_ttl
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Snapshot of the counters, keyed by namespace."""
+        return {
+            namespace: dict(counters) for namespace, counters in self._stats.items()
+        }
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Look up several keys, local tier first and the rest in one Redis MGET.
+
+        Only keys that were found are returned; negative entries map to None.
+        """
+        found: Dict[str, Any] = {}
+        remote_keys = []
+        for key in keys:
+            hit, value = self.local.get(key)
+            if hit:
+                self._count(key, "local_hits")
+                found[key] = value
+            else:
+                remote_keys.append(key)
+
+        for key, value in zip(remote_keys, await self.backend.mget(remote_keys)):
+            if value is None:
+                self._count(key, "misses")
+                continue
+            self._count(key, "redis_hits")
+            if value == NEGATIVE_ENTRY:
+                value = None
+            # Redis does not tell us the remaining TTL, so promote with the local TTL
+            self.local.set(key, value, self.local_ttl)
+            found[key] = value
+
+        for key, value in found.items():
+            if value is None:
+                self._count(key, "negative_hits")
+        return found
+
+    async def lookup(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value); a negative entry is found with value None."""
+        found = await self.get_many([key])
+        return key in found, found.get(key)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.lookup(key))[1]
+
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        expire: Optional[int] = None,
+        negative_expire: Optional[int] = None,
+    ):
+        """
+        Store several values in both tiers. `None` values are stored as negative
+        entries when `negative_expire` is given and skipped otherwise.
+        """
+        positive = {k: v for k, v in mapping.items() if v is not None}
+        negative = [k for k, v in mapping.items() if v is None]
+
+        for key, value in positive.items():
+            self.local.set(key, value, self._local_ttl(expire))
+        await self.backend.mset(positive, expire=expire)
+
+        if negative_expire and negative:
+            for key in negative:
+                self.local.set(key, None, self._local_ttl(negative_expire))
+            await self.backend.mset(
+                {key: NEGATIVE_ENTRY for key in negative}, expire=negative_expire
+            )
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        expire: Optional[int] = None,
+        negative_expire: Optional[int] = None,
+    ):
+        await self.set_many(
+            {key: value}, expire=expire, negative_expire=negative_expire
+        )
+
+    async def single_flight(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fetch` for `key` unless a fetch for it is already in flight, in
+        which case wait for and share that result.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._count(key, "coalesced")
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if task is not None and task.cancelling():
+                    raise
+                # The leading fetch was cancelled, not us: fetch ourselves
+                return await self.single_flight(key, fetch)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._count(key, "fetches")
+        try:
+            result = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unobserved failure is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def get_or_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        expire: Optional[int] = None,
+        negative_expire: Optional[int] = None,
+    ) -> Optional[Any]:
+        """Return the cached value for `key`, fetching and caching it on a miss."""
+        found, value = await self.lookup(key)
+        if found:
+            return value
+
+        async def fetch_and_store():
+            result = await fetch()
+            await self.set(key, result, expire=expire, negative_expire=negative_expire)
+            return result
+
+        return await self.single_flight(key, fetch_and_store)
 
 
-cache = RedisCache()
+redis_cache = RedisCache()
+cache = TieredCache(redis_cache)
@@ -0,0 +1,67 @@
+import math
+from typing import Optional
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Calculate the great-circle distance between two points on the Earth (in kilometers)."""
+    R = EARTH_RADIUS_KM
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+def haversine_distances(
+    lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray
+) -> np.ndarray:
+    """
+    Great-circle distances (km) from one point to arrays of points, computed in one pass.
+
+    NaN coordinates (e.g. addresses that could not be geocoded) yield inf.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs) - math.radians(lng)
+
+    a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    distances = 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return np.where(np.isnan(distances), np.inf, distances)
+
+
+def nearest_indices(
+    distances: np.ndarray, k: int, max_radius_km: Optional[float] = None
+) -> np.ndarray:
+    """
+    Indices of the k smallest distances, closest first.
+
+    Uses a partial selection (argpartition) so only the k winners are sorted.
+    Points further than `max_radius_km` are dropped when a radius is given.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    candidates = np.arange(len(distances))
+
+    if max_radius_km is not None:
+        candidates = candidates[distances <= max_radius_km]
+
+    if k <= 0 or len(candidates) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if len(candidates) > k:
+        partition = np.argpartition(distances[candidates], k - 1)[:k]
+        candidates = np.sort(candidates[partition])
+
+    # Stable sort keeps the original order among equal distances (e.g. inf)
+    return candidates[np.argsort(distances[candidates], kind="stable")]
@@ -0,0 +1,37 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Threads available to libraries that only offer blocking calls (googlemaps).
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "16"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="blocking-io"
+)
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call on the bounded I/O pool without blocking the event loop.
+
+    Context variables (e.g. the Socket.IO session) are carried into the thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor, functools.partial(ctx.run, fn, *args, **kwargs)
+    )
+
+
+def submit_blocking(fn: Callable[..., Any], *args: Any) -> Future:
+    """Start a blocking call on the I/O pool without waiting for it."""
+    return _executor.submit(fn, *args)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -5,57 +5,112 @@ from agent_flow.nodes.api_calls import api_call_agent
 from agent_flow.nodes.generate import generate_final_response
 from agent_flow.nodes.query_validation import query_validation
 from agent_flow.nodes.evaluate import evaluate_api_results
+from agent_flow.metrics import timed_node
+from agent_flow.speculation import SPECULATIVE_EXECUTION, speculate
 from agent_flow.state import GraphState
 import json
+import logging
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 def decide_to_proceed(state):
     is_valid_query = state.get("is_valid_query")
-    print(f"  is_valid_query: {is_valid_query}")
 
     should_proceed = True if is_valid_query == "VALID" else False
-    print(f"  should_proceed: {should_proceed}")
+    logger.debug("is_valid_query=%s, proceeding: %s", is_valid_query, should_proceed)
 
     if should_proceed:
-        print("DECISION: PROCEEDING... (will trigger api_call)")
         return "api_call"
     else:
-        print("DECISION: NOT PROCEEDING... (will trigger generate)")
         return "generate"
 
 
 def decide_to_search(state):
     use_search = state.get("use_search")
-
-    print(f"  use_search flag is set to: {use_search}")
+    logger.debug("use_search=%s", use_search)
 
     if use_search:
-        print("DECISION: SEARCHING... (will trigger google_maps_search)")
         return "google_maps_search"
     else:
-        print("DECISION: NOT SEARCHING... (will trigger generate)")
         return "generate"
 
 
-graph = StateGraph(GraphState)
-
-graph.add_node("validate_query", query_validation)
-graph.add_node("api_call", api_call_agent)
-graph.add_node("evaluate_results", evaluate_api_results)
-graph.add_node("google_maps_search", web_search)
-graph.add_node("generate", generate_final_response)
-
-graph.set_entry_point("validate_query")
-graph.add_conditional_edges("validate_query", decide_to_proceed)
-
-
-graph.add_edge("api_call", "evaluate_results")
-graph.add_conditional_edges("evaluate_results", decide_to_search)
-
-graph.add_edge("google_maps_search", "generate")
-graph.add_edge("generate", END)
+def build_sequential_graph():
+    graph = StateGraph(GraphState)
+
+    graph.add_node("validate_query", timed_node("validate_query")(query_validation))
+    graph.add_node("api_call", timed_node("api_call")(api_call_agent))
+    graph.add_node(
+        "evaluate_results", timed_node("evaluate_results")(evaluate_api_results)
+    )
+    graph.add_node("google_maps_search", timed_node("google_maps_search")(web_search))
+    graph.add_node("generate", timed_node("generate")(generate_final_response))
+
+    graph.set_entry_point("validate_query")
+    graph.add_conditional_edges("validate_query", decide_to_proceed)
+
+    graph.add_edge("api_call", "evaluate_results")
+    graph.add_conditional_edges("evaluate_results", decide_to_search)
+
+    graph.add_edge("google_maps_search", "generate")
+    graph.add_edge("generate", END)
+
+    return graph
+
+
+def build_speculative_graph():
+    """
+    Same flow, but the API lookup starts alongside query validation and the
+    Google Maps search alongside result evaluation. Each speculative run is
+    kept only if the routing decision goes its way.
+    """
+    graph = StateGraph(GraphState)
+
+    # Nodes are timed individually, as in the sequential graph (a cancelled
+    # speculative run records the time until it was cancelled)
+    graph.add_node(
+        "validate_query",
+        speculate(
+            "api_call",
+            timed_node("validate_query")(query_validation),
+            decide_to_proceed,
+            "api_call",
+            timed_node("api_call")(api_call_agent),
+        ),
+    )
+    graph.add_node(
+        "evaluate_results",
+        speculate(
+            "google_maps_search",
+            timed_node("evaluate_results")(evaluate_api_results),
+            decide_to_search,
+            "google_maps_search",
+            timed_node("google_maps_search")(web_search),
+        ),
+    )
+    graph.add_node("generate", timed_node("generate")(generate_final_response))
+
+    graph.set_entry_point("validate_query")
+    graph.add_conditional_edges(
+        "validate_query",
+        decide_to_proceed,
+        {"api_call": "evaluate_results", "generate": "generate"},
+    )
+
+    # Search results, if any, were already merged into the evaluate update
+    graph.add_edge("evaluate_results", "generate")
+    graph.add_edge("generate", END)
+
+    return graph
+
+
+if SPECULATIVE_EXECUTION:
+    graph = build_speculative_graph()
+else:
+    graph = build_sequential_graph()
 
 app = graph.compile()
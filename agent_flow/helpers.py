@@ -1,13 +1,23 @@
-import requests
+import asyncio
 import json
-import os
+import logging
 import math
+import os
 import re
 import spacy
 import googlemaps
-import sqlite3
-from typing import List, Dict, Any
+import httpx
+import numpy as np
+from typing import List, Dict, Any, Optional
 from .cache import cache
+from .executor import run_blocking
+from .distance import haversine_distances, nearest_indices
+from .metrics import track_dependency
+from .http_client import CKAN_BASE_URL, get_http_client, new_http_client
+from .log import Summary
+from .mirror import query_mirror
+
+logger = logging.getLogger(__name__)
 
 try:
     nlp = spacy.load("en_core_web_sm")
@@ -16,36 +26,62 @@ except OSError:
 
 googlemaps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
 gmaps = googlemaps.Client(key=googlemaps_api_key)
-print("Using Google Maps with API key authentication in helpers.py")
+logger.info("Using Google Maps with API key authentication")
 
+GEOCODE_CACHE_TTL = 86400
+GEOCODE_NEGATIVE_CACHE_TTL = 900
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", "8"))
 
-def api_search(package_id: str, filters: dict) -> dict:
-    # Toronto Open Data is stored in a CKAN instance. It's APIs are documented here:
-    # https://docs.ckan.org/en/latest/api/
+# Key added to ranked results with their distance from the user
+DISTANCE_KEY = "distance_km"
 
-    print("GETTING DATA FROM API...")
 
-    # Only include non-empty filter keys
+def clean_filters(filters) -> Dict[str, Any]:
+    """Convert a filter model or dict to a dict with only the non-empty keys."""
     if hasattr(filters, "dict"):
         filters_dict = filters.dict()
     else:
         filters_dict = dict(filters)
-    filters_clean = {
+    return {
         key: value
         for key, value in filters_dict.items()
         if value != "" and value is not None
     }
 
-    print(f"Clean filters: {filters_clean}")
+
+def api_search(package_id: str, filters: dict) -> dict:
+    """Synchronous wrapper around `aapi_search` for callers outside the event loop."""
+
+    async def _run():
+        async with new_http_client() as client:
+            return await aapi_search(package_id, filters, client=client)
+
+    return asyncio.run(_run())
+
+
+async def aapi_search(
+    package_id: str, filters: dict, client: Optional[httpx.AsyncClient] = None
+) -> dict:
+    client = client or get_http_client()
+
+    filters_clean = clean_filters(filters)
+
+    logger.debug("Searching %s with filters %s", package_id, filters_clean)
+
+    # Serve from the local mirror when it is fresh; otherwise go to CKAN live
+    mirrored_results = await run_blocking(query_mirror, package_id, filters_clean)
+    if mirrored_results is not None:
+        logger.debug("Answered from local mirror: %d results", len(mirrored_results))
+        return mirrored_results
 
     # To hit our API, you'll be making requests to:
-    base_url = "https://ckan0.cf.opendata.inter.prod-toronto.ca"
+    base_url = CKAN_BASE_URL
 
     # Datasets are called "packages". Each package can contain many "resources"
     # To retrieve the metadata for this package and its resources, use the package name in this page's URL:
     url = base_url + "/api/3/action/package_show"
     params = {"id": package_id}
-    package = requests.get(url, params=params).json()
+    package = (await client.get(url, params=params)).json()
 
     results = []
 
@@ -59,8 +95,9 @@ def api_search(package_id: str, filters: dict) -> dict:
         if resource["datastore_active"]:
             # If we have language filtering, use full-text search approach
             if languages_filter:
-                print(
-                    f"Using full-text search for language filtering: {languages_filter}"
+                logger.debug(
+                    "Using full-text search for language filtering: %s",
+                    languages_filter,
                 )
 
                 # Parse semicolon-separated languages
@@ -69,7 +106,6 @@ def api_search(package_id: str, filters: dict) -> dict:
                 ]
 
                 # Method 1: Try full-text search with q parameter
-                print("Attempting full-text search method...")
                 url = base_url + "/api/3/action/datastore_search"
 
                 # Create search query for languages
@@ -88,19 +124,22 @@ def api_search(package_id: str, filters: dict) -> dict:
                 if other_filters:
                     params["filters"] = json.dumps(other_filters)
 
-                print(f"Full-text search params: {params}")
+                logger.debug("Full-text search params: %s", params)
 
                 try:
-                    resource_response = requests.get(url, params=params)
-                    print(f"Full-text response status: {resource_response.status_code}")
+                    resource_response = await client.get(url, params=params)
+                    logger.debug(
+                        "Full-text response status: %s", resource_response.status_code
+                    )
 
                     if resource_response.status_code == 200:
                         response_json = resource_response.json()
 
                         if response_json.get("success"):
                             all_results = response_json["result"].get("records", [])
-                            print(
-                                f"Full-text search returned {len(all_results)} total results"
+                            logger.debug(
+                                "Full-text search returned %d total results",
+                                len(all_results),
                             )
 
                             # Post-filter to ensure language matches are in the languages field
@@ -116,37 +155,32 @@ def api_search(package_id: str, filters: dict) -> dict:
                                     filtered_results.append(result)
 
                             results = filtered_results[:50]  # Limit final results
-                            print(
-                                f"After language field filtering: {len(results)} results"
+                            logger.debug(
+                                "After language field filtering: %d results",
+                                len(results),
                             )
-
-                            # Debug: show languages in first few results
-                            for i, result in enumerate(results[:3]):
-                                prog_name = result.get("program_name", "No name")
-                                lang_field = result.get("languages", "No languages")
-                                print(
-                                    f"Filtered Result {i+1}: {prog_name} - Languages: {lang_field}"
-                                )
                         else:
-                            print(
-                                f"Full-text search API returned success=false: {response_json}"
+                            logger.warning(
+                                "Full-text search API returned success=false: %s",
+                                Summary(response_json),
                             )
                             results = []
                     else:
-                        print(
-                            f"Full-text search HTTP error: {resource_response.status_code}"
+                        logger.warning(
+                            "Full-text search HTTP error %s: %s",
+                            resource_response.status_code,
+                            resource_response.text[:200],
                         )
-                        print(f"Response content: {resource_response.text[:200]}")
                         results = []
 
                 except Exception as e:
-                    print(f"Error in full-text search: {e}")
+                    logger.warning("Error in full-text search: %s", e)
                     results = []
 
                 # If full-text search didn't work or returned no results, try getting all records and filtering in Python
                 if not results:
-                    print(
-                        "Full-text search failed or returned no results. Trying get-all-and-filter approach..."
+                    logger.debug(
+                        "Full-text search found nothing; trying get-all-and-filter"
                     )
                     url = base_url + "/api/3/action/datastore_search"
 
@@ -161,13 +195,14 @@ def api_search(package_id: str, filters: dict) -> dict:
                         params["filters"] = json.dumps(other_filters)
 
                     try:
-                        resource_response = requests.get(url, params=params)
+                        resource_response = await client.get(url, params=params)
                         if resource_response.status_code == 200:
                             response_json = resource_response.json()
                             if response_json.get("success"):
                                 all_results = response_json["result"].get("records", [])
-                                print(
-                                    f"Get-all approach returned {len(all_results)} total results"
+                                logger.debug(
+                                    "Get-all approach returned %d total results",
+                                    len(all_results),
                                 )
 
                                 # Filter in Python for language matches
@@ -181,34 +216,27 @@ def api_search(package_id: str, filters: dict) -> dict:
                                         filtered_results.append(result)
 
                                 results = filtered_results[:50]  # Limit final results
-                                print(
-                                    f"Python filtering found {len(results)} matching results"
+                                logger.debug(
+                                    "Python filtering found %d matching results",
+                                    len(results),
                                 )
-
-                                # Debug: show languages in first few results
-                                for i, result in enumerate(results[:3]):
-                                    prog_name = result.get("program_name", "No name")
-                                    lang_field = result.get("languages", "No languages")
-                                    print(
-                                        f"Python Filtered Result {i+1}: {prog_name} - Languages: {lang_field}"
-                                    )
                             else:
-                                print(
-                                    f"Get-all API returned success=false: {response_json}"
+                                logger.warning(
+                                    "Get-all API returned success=false: %s",
+                                    Summary(response_json),
                                 )
                                 results = []
                         else:
-                            print(
-                                f"Get-all HTTP error: {resource_response.status_code}"
+                            logger.warning(
+                                "Get-all HTTP error: %s", resource_response.status_code
                             )
                             results = []
                     except Exception as e:
-                        print(f"Error in get-all approach: {e}")
+                        logger.warning("Error in get-all approach: %s", e)
                         results = []
 
             else:
                 # No language filtering, use regular datastore_search
-                print("Using regular datastore_search (no language filtering)")
                 url = base_url + "/api/3/action/datastore_search"
 
                 if len(filters_clean) > 0:
@@ -217,74 +245,123 @@ def api_search(package_id: str, filters: dict) -> dict:
                         "limit": 50,
                         "filters": json.dumps(filters_clean),
                     }
-                    print(f"Regular search params: {p}")
                 else:
                     p = {"id": resource_id, "limit": 50}
 
-                resource_response = requests.get(url, params=p).json()
-                print("Regular resource response received")
+                resource_response = (await client.get(url, params=p)).json()
 
                 if resource_response.get("success"):
                     resource_search_data = resource_response["result"]
                     results = resource_search_data.get("records", [])
-                    print(f"Regular search returned {len(results)} results")
+                    logger.debug("Regular search returned %d results", len(results))
                 else:
-                    print(f"Regular search failed: {resource_response}")
+                    logger.warning(
+                        "Regular search failed: %s", Summary(resource_response)
+                    )
                     results = []
 
-    print("FINISHED GETTING DATA FROM API...")
-    print(f"Total results found: {len(results)}")
+    logger.debug("Total results found: %d", len(results))
     return results
 
 
-def geocode_address(address: str) -> dict:
+def _geocode_cache_key(address: str) -> str:
+    return f"geocode:{address.lower().strip()}"
+
+
+def _geocode_uncached(address: str) -> Optional[dict]:
+    """Resolve an address with the Google Maps Geocoding API (blocking, no caching)."""
+    if not googlemaps_api_key:
+        raise ValueError("GOOGLE_MAPS_API_KEY environment variable not set.")
+
+    with track_dependency("google_geocode"):
+        geocode_result = gmaps.geocode(
+            address,
+            region="ca",
+            components={"country": "CA", "administrative_area": "ON"},
+        )
+
+    if geocode_result:
+        location = geocode_result[0]["geometry"]["location"]
+        return {"lat": location["lat"], "lng": location["lng"]}
+    return None
+
+
+async def geocode_address(address: str) -> dict:
     """Geocode an address using Google Maps Geocoding API via googlemaps client, with Redis caching."""
-    print("GEOCODING ADDRESS:", address)
+    logger.debug("Geocoding address: %s", address)
 
-    cache_key = f"geocode:{address.lower().strip()}"
+    return await cache.get_or_fetch(
+        _geocode_cache_key(address),
+        lambda: run_blocking(_geocode_uncached, address),
+        expire=GEOCODE_CACHE_TTL,
+        negative_expire=GEOCODE_NEGATIVE_CACHE_TTL,
+    )
 
-    cached_result = cache.get(cache_key)
 
-    if cached_result:
-        print("Using cached geocode result.")
-        return cached_result
+async def geocode_addresses(
+    addresses: List[str], concurrency: int = GEOCODE_CONCURRENCY
+) -> Dict[str, Optional[dict]]:
+    """
+    Geocode many addresses at once.
+
+    Cache hits (including remembered failures) are resolved from the local
+    tier or a single Redis MGET. Misses are sent to Google concurrently (at
+    most `concurrency` in flight, one request per address across coroutines)
+    and written back with one pipelined SET. Addresses Google has no result
+    for map to None; addresses whose lookup failed (quota, network, ...) are
+    left out, so callers can tell the two apart and retry the latter.
+    """
+    unique_addresses = list(dict.fromkeys(address for address in addresses if address))
+    if not unique_addresses:
+        return {}
+
+    keys = {address: _geocode_cache_key(address) for address in unique_addresses}
+    cached = await cache.get_many(list(keys.values()))
+    results = {address: cached.get(key) for address, key in keys.items()}
+    misses = [address for address, key in keys.items() if key not in cached]
+
+    logger.debug(
+        "Geocoding %d addresses: %d cached, %d to resolve",
+        len(unique_addresses),
+        len(unique_addresses) - len(misses),
+        len(misses),
+    )
 
-    print("No cached result found, querying Google Maps API...")
+    if not misses:
+        return results
 
     if not googlemaps_api_key:
         raise ValueError("GOOGLE_MAPS_API_KEY environment variable not set.")
 
-    geocode_result = gmaps.geocode(
-        address,
-        region="ca",
-        components={"country": "CA", "administrative_area": "ON"},
-    )
+    semaphore = asyncio.Semaphore(concurrency)
 
-    if geocode_result:
-        location = geocode_result[0]["geometry"]["location"]
-        lat, lng = location["lat"], location["lng"]
-
-        result = {"lat": lat, "lng": lng}
+    async def fetch(address: str) -> Optional[dict]:
+        async with semaphore:
+            return await run_blocking(_geocode_uncached, address)
 
-        cache.set(cache_key, result, expire=86400)
+    to_cache = {}
 
-        return result
-    return None
+    async def resolve(address: str):
+        try:
+            coords = await cache.single_flight(keys[address], lambda: fetch(address))
+        except Exception as e:
+            # Errors are not cached; only "no result" answers are remembered
+            logger.warning("Error geocoding %s: %s", address, e)
+            return
+        to_cache[keys[address]] = coords
+        results[address] = coords
 
+    for address in misses:
+        del results[address]
+    await asyncio.gather(*(resolve(address) for address in misses))
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points on the Earth (in kilometers)."""
-    R = 6371  # Earth radius in km
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    await cache.set_many(
+        to_cache,
+        expire=GEOCODE_CACHE_TTL,
+        negative_expire=GEOCODE_NEGATIVE_CACHE_TTL,
     )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+
+    return results
 
 
 def extract_location_from_query(query: str) -> str:
@@ -315,6 +392,14 @@ def extract_location_from_query(query: str) -> str:
 #     return query.strip()
 
 
+def with_distance(record: Dict[str, Any], distance: float) -> Dict[str, Any]:
+    """Copy of `record` annotated with its distance from the user, when known."""
+    annotated = dict(record)
+    if math.isfinite(distance):
+        annotated[DISTANCE_KEY] = round(float(distance), 2)
+    return annotated
+
+
 def prune_results(
     results: List[Dict[str, Any]], essential_keys: List[str]
 ) -> List[Dict[str, Any]]:
@@ -342,40 +427,49 @@ def prune_results(
     return pruned_list
 
 
-def filter_results_by_proximity(
+async def filter_results_by_proximity(
     results: List[Dict[str, Any]],
     user_coords: Dict[str, float],
     address_field: str,
     essential_keys: List[str],
     limit: int = 6,
+    max_radius_km: Optional[float] = None,
 ) -> List[Dict[str, Any]]:
     """
     Filter API results by proximity to user location.
     """
     if not user_coords:
-        print(f"Could not geocode user location: {user_coords}")
+        logger.debug("No user location; keeping the first %d results", limit)
         filtered_results = results[:limit]
     else:
-        # Geocode each result's address and calculate distance
-        results_with_distance = []
-        for result in results:
-            address = result.get(address_field, "")
-            coords = geocode_address(address) if address else None
-            if coords:
-                dist = haversine_distance(
-                    user_coords["lat"], user_coords["lng"], coords["lat"], coords["lng"]
-                )
-                print(f"Distance to {address}: {dist:.2f} km")
-                results_with_distance.append((dist, result))
-            else:
-                # If can't geocode, put at end with high distance
-                results_with_distance.append((float("inf"), result))
-
-        # Sort by distance and take top 'limit' results
-        results_with_distance.sort(key=lambda x: x[0])
-        filtered_results = [result for _, result in results_with_distance[:limit]]
+        # Geocode every result's address in one batch and calculate distances
+        coords_by_address = await geocode_addresses(
+            [result.get(address_field, "") for result in results]
+        )
+
+        # Results that can't be geocoded get NaN coordinates, i.e. infinite distance
+        coords = [
+            coords_by_address.get(result.get(address_field, "")) or {}
+            for result in results
+        ]
+        distances = haversine_distances(
+            user_coords["lat"],
+            user_coords["lng"],
+            np.array([c.get("lat", np.nan) for c in coords], dtype=np.float64),
+            np.array([c.get("lng", np.nan) for c in coords], dtype=np.float64),
+        )
+
+        nearest = nearest_indices(distances, limit, max_radius_km)
+        filtered_results = [with_distance(results[i], distances[i]) for i in nearest]
+        logger.debug(
+            "Ranked %d results by distance; kept %d",
+            len(results),
+            len(filtered_results),
+        )
 
     # Prune the filtered results to include only essential keys
-    final_pruned_results = prune_results(filtered_results, essential_keys)
+    final_pruned_results = prune_results(
+        filtered_results, essential_keys + [DISTANCE_KEY]
+    )
 
     return final_pruned_results
@@ -0,0 +1,53 @@
+import os
+from typing import Optional
+import httpx
+from dotenv import load_dotenv
+from .metrics import AsyncTimedTransport
+
+load_dotenv()
+
+# Toronto Open Data is stored in a CKAN instance. It's APIs are documented here:
+# https://docs.ckan.org/en/latest/api/
+# (overridable, e.g. to point the benchmarks at a local stand-in)
+CKAN_BASE_URL = os.getenv(
+    "CKAN_BASE_URL", "https://ckan0.cf.opendata.inter.prod-toronto.ca"
+)
+
+# Connection pool and timeouts shared by every outbound call to Toronto Open Data.
+HTTP_TIMEOUT = httpx.Timeout(
+    float(os.getenv("HTTP_TIMEOUT_SECONDS", "15")),
+    connect=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5")),
+)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry=30.0,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def new_http_client() -> httpx.AsyncClient:
+    """Create a client with the shared pool limits and timeouts."""
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        transport=AsyncTimedTransport(
+            httpx.AsyncHTTPTransport(limits=HTTP_LIMITS), "ckan"
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = new_http_client()
+    return _client
+
+
+async def close_http_client():
+    """Close the process-wide client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
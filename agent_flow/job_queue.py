@@ -0,0 +1,92 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+from .cache import redis_cache
+from .scheduler import MAX_QUEUED_QUERIES, PRIORITY_CRISIS, PRIORITY_LOW
+
+# With GRAPH_QUEUE_MODE=1 the web process only enqueues queries; graphs run
+# in `python -m agent_flow.worker` processes
+GRAPH_QUEUE_MODE = os.getenv("GRAPH_QUEUE_MODE", "0") == "1"
+
+JOB_QUEUE_PREFIX = os.getenv("JOB_QUEUE_PREFIX", "carebridge:jobs")
+JOB_CANCEL_CHANNEL = f"{JOB_QUEUE_PREFIX}:cancel"
+# How long a cancellation is remembered for a job still waiting in the queue
+JOB_CANCEL_TTL_SECONDS = 3600
+# Shorter than REDIS_SOCKET_TIMEOUT_SECONDS so a blocking pop never times out the socket
+JOB_POP_TIMEOUT_SECONDS = 1
+
+# One list per priority; BRPOP checks them in this order
+QUEUE_KEYS = [
+    f"{JOB_QUEUE_PREFIX}:{priority}"
+    for priority in range(PRIORITY_CRISIS, PRIORITY_LOW + 1)
+]
+
+# Check the bound and push in one step, so concurrent web instances cannot
+# overfill the queue between an LLEN and an LPUSH
+ENQUEUE_SCRIPT = """
+local queued = 0
+for _, key in ipairs(KEYS) do
+    queued = queued + redis.call('LLEN', key)
+end
+if queued >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('LPUSH', KEYS[tonumber(ARGV[2])], ARGV[3])
+return 1
+"""
+
+_enqueue_script = None
+
+
+def _cancelled_key(job_id: str) -> str:
+    return f"{JOB_QUEUE_PREFIX}:cancelled:{job_id}"
+
+
+async def enqueue_job(
+    sid: str, query: str, location: Optional[Dict[str, Any]], priority: int
+) -> Optional[str]:
+    """Queue a query for the workers; returns its job id, or None if the queue is full."""
+    global _enqueue_script
+    if _enqueue_script is None:
+        _enqueue_script = redis_cache.client.register_script(ENQUEUE_SCRIPT)
+
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "sid": sid,
+        "query": query,
+        "users_location": location,
+        "enqueued_at": time.time(),
+    }
+    # Lua lists are 1-based
+    args = [MAX_QUEUED_QUERIES, priority - PRIORITY_CRISIS + 1, json.dumps(job)]
+    if not await _enqueue_script(keys=QUEUE_KEYS, args=args):
+        return None
+    return job_id
+
+
+async def next_job() -> Optional[Dict[str, Any]]:
+    """The oldest job of the most urgent non-empty queue, or None after a short wait."""
+    popped = await redis_cache.client.brpop(QUEUE_KEYS, timeout=JOB_POP_TIMEOUT_SECONDS)
+    if popped is None:
+        return None
+    _, payload = popped
+    return json.loads(payload)
+
+
+async def cancel_job(job_id: str, reason: str):
+    """
+    Cancel a job wherever it is: queued jobs are skipped when popped, and the
+    worker running it is told over pub/sub.
+    """
+    async with redis_cache.pipeline() as pipe:
+        pipe.set(_cancelled_key(job_id), reason, ex=JOB_CANCEL_TTL_SECONDS)
+        pipe.publish(JOB_CANCEL_CHANNEL, json.dumps({"id": job_id, "reason": reason}))
+        await pipe.execute()
+
+
+async def cancellation_reason(job_id: str) -> Optional[str]:
+    """Why a job was cancelled before it was popped, or None if it was not."""
+    return await redis_cache.client.get(_cancelled_key(job_id))
@@ -0,0 +1,141 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for log collectors, "text" for a terminal
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Fraction of requests whose debug payload dumps are logged in full
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0"))
+
+# Libraries that log every request at INFO
+QUIET_LOGGERS = ["httpx", "httpcore", "openai", "googlemaps"]
+
+SUMMARY_MAX_ITEMS = 3
+SUMMARY_MAX_CHARS = 200
+
+NO_REQUEST_ID = "-"
+
+_request_id: ContextVar[str] = ContextVar("request_id", default=NO_REQUEST_ID)
+_sample_payloads: ContextVar[bool] = ContextVar("sample_payloads", default=False)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "request_id"}
+
+_listener: Optional[QueueListener] = None
+
+
+def bind_request_id(request_id: Optional[str] = None) -> str:
+    """
+    Tag the current task's log records with `request_id` (a fresh one if not
+    given) and decide whether this request's payloads are logged in full.
+    """
+    request_id = request_id or uuid.uuid4().hex[:12]
+    _request_id.set(request_id)
+    _sample_payloads.set(random.random() < LOG_PAYLOAD_SAMPLE_RATE)
+    return request_id
+
+
+class Summary:
+    """
+    Log argument that renders a compact description of a large payload, and
+    only if the record is actually emitted. Requests picked by
+    LOG_PAYLOAD_SAMPLE_RATE get the full repr instead.
+    """
+
+    __slots__ = ("value", "full")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.full = _sample_payloads.get()
+
+    def __str__(self) -> str:
+        if self.full:
+            return repr(self.value)
+        return summarize(self.value)
+
+
+def summarize(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        head = ", ".join(summarize(item) for item in value[:SUMMARY_MAX_ITEMS])
+        more = ", ..." if len(value) > SUMMARY_MAX_ITEMS else ""
+        return f"[{len(value)} items: {head}{more}]"
+    if isinstance(value, dict):
+        keys = ", ".join(str(key) for key in list(value)[:SUMMARY_MAX_ITEMS])
+        more = ", ..." if len(value) > SUMMARY_MAX_ITEMS else ""
+        return f"{{{len(value)} keys: {keys}{more}}}"
+    text = str(value)
+    if len(text) > SUMMARY_MAX_CHARS:
+        return f"{text[:SUMMARY_MAX_CHARS]}... ({len(text)} chars)"
+    return text
+
+
+class _RequestIdFilter(logging.Filter):
+    # Handler filters run in the caller's thread, so this sees its context
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra` fields are included as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.request_id != NO_REQUEST_ID:
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Route all logging through a queue so request handlers never block on the
+    output stream; a listener thread formats and writes the records.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(
+            logging.Formatter(
+                "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+            )
+        )
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(_RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
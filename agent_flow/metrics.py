@@ -0,0 +1,314 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+# Seconds; covers Redis round trips up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)  # fmt: skip
+
+LabelValues = Tuple[str, ...]
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, safe to observe from worker threads."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        # Per series: one count per bucket (+Inf last), then the sum
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self) -> Dict[LabelValues, Dict[str, float]]:
+        """Observation count and total per label set."""
+        with self._lock:
+            return {
+                labels: {"count": sum(values[:-1]), "sum": values[-1]}
+                for labels, values in self._series.items()
+            }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                label_str = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{label_str} {cumulative:g}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{label_str} {cumulative:g}")
+        return lines
+
+
+class Gauge:
+    """A value per label set that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            lines.append(
+                f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}"
+            )
+        return lines
+
+
+class Counter(Gauge):
+    """A monotonically increasing count per label set."""
+
+    type = "counter"
+
+
+Snapshot = Callable[[], Dict[str, Any]]
+
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics and renders them in Prometheus text format.
+
+    Hot paths only touch a histogram or gauge. Stats that components already
+    keep (cache counters, classifier decisions, ...) are registered as
+    snapshot functions and read only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._snapshots: List[Tuple[str, str, Optional[str], Snapshot]] = []
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        return self._add(Histogram(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        return self._add(Gauge(name, help, labelnames))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        return self._add(Counter(name, help, labelnames))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_snapshot(
+        self, prefix: str, help: str, snapshot: Snapshot, label: Optional[str] = None
+    ):
+        """
+        Expose a stats snapshot as gauges named `prefix_<key>`.
+
+        With `label`, the snapshot maps label values to {key: number} dicts
+        (e.g. cache stats per namespace); otherwise it maps keys to numbers.
+        """
+        self._snapshots.append((prefix, help, label, snapshot))
+
+    def _render_snapshot(self, prefix, help, label, snapshot) -> List[str]:
+        try:
+            data = snapshot()
+        except Exception as e:
+            logger.warning("Error collecting %s metrics: %s", prefix, e)
+            return []
+
+        series: Dict[str, List[str]] = {}
+        rows = data.items() if label else [(None, data)]
+        for label_value, values in rows:
+            for key, value in values.items():
+                if not isinstance(value, (int, float)):
+                    continue
+                labels = _format_labels([label], [label_value]) if label else ""
+                series.setdefault(f"{prefix}_{key}", []).append(
+                    f"{prefix}_{key}{labels} {value:g}"
+                )
+
+        lines = []
+        for name, samples in sorted(series.items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return lines
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for entry in self._snapshots:
+            lines.extend(self._render_snapshot(*entry))
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+node_latency = metrics.histogram(
+    "carebridge_node_duration_seconds", "Graph node latency.", ["node"]
+)
+dependency_latency = metrics.histogram(
+    "carebridge_dependency_duration_seconds",
+    "Latency of calls to external dependencies.",
+    ["dependency", "outcome"],
+)
+queries_in_flight = metrics.gauge(
+    "carebridge_queries_in_flight", "Queries currently being answered."
+)
+queries_total = metrics.counter(
+    "carebridge_queries_total", "Queries answered, by source.", ["source"]
+)
+socketio_connections = metrics.gauge(
+    "carebridge_socketio_connections", "Connected Socket.IO clients."
+)
+
+
+@contextmanager
+def track_dependency(dependency: str):
+    """
+    Time a call to an external dependency, labelled by whether it raised or
+    was abandoned because the query was cancelled.
+    """
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    finally:
+        dependency_latency.observe(time.perf_counter() - start, dependency, outcome)
+
+
+def timed_node(name: str):
+    """Record the latency of an async graph node under `name`."""
+
+    def decorator(node):
+        @wraps(node)
+        async def run(state):
+            with node_latency.time(name):
+                return await node(state)
+
+        return run
+
+    return decorator
+
+
+def _response_outcome(response: httpx.Response) -> str:
+    return "ok" if response.status_code < 500 else "error"
+
+
+class TimedTransport(httpx.BaseTransport):
+    """
+    Wraps an httpx transport to record request latency for `dependency`.
+
+    Measured up to the response headers, so for streamed responses this is
+    the time to first byte.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, dependency: str):
+        self._transport = transport
+        self._dependency = dependency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._transport.handle_request(request)
+            outcome = _response_outcome(response)
+            return response
+        finally:
+            dependency_latency.observe(
+                time.perf_counter() - start, self._dependency, outcome
+            )
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncTimedTransport(httpx.AsyncBaseTransport):
+    """
+    Async counterpart of TimedTransport; requests abandoned because the
+    query was cancelled are recorded as "cancelled".
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, dependency: str):
+        self._transport = transport
+        self._dependency = dependency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._transport.handle_async_request(request)
+            outcome = _response_outcome(response)
+            return response
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            dependency_latency.observe(
+                time.perf_counter() - start, self._dependency, outcome
+            )
+
+    async def aclose(self):
+        await self._transport.aclose()
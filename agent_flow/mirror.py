@@ -0,0 +1,436 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import httpx
+from dotenv import load_dotenv
+from .http_client import CKAN_BASE_URL, get_http_client, new_http_client
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MIRROR_DB_PATH = os.getenv("MIRROR_DB_PATH", "data/mirror.sqlite3")
+MIRROR_SYNC_INTERVAL_SECONDS = int(os.getenv("MIRROR_SYNC_INTERVAL_SECONDS", "1800"))
+MIRROR_PAGE_SIZE = 10000
+MIRROR_RESULT_LIMIT = 50
+
+
+@dataclass(frozen=True)
+class MirroredDataset:
+    """Describes how a CKAN datastore resource is laid out in the local mirror."""
+
+    table: str
+    address_column: str
+    filter_columns: List[str]
+    max_age_seconds: int
+    language_column: Optional[str] = None
+    # Column holding the snapshot date; queries only see the latest snapshot
+    snapshot_column: Optional[str] = None
+    # Append-only resources are refreshed by fetching the rows past our row count
+    append_only: bool = False
+
+    @property
+    def indexed_columns(self) -> List[str]:
+        if self.snapshot_column:
+            return [*self.filter_columns, self.snapshot_column]
+        return list(self.filter_columns)
+
+
+DATASETS: Dict[str, MirroredDataset] = {
+    "daily-shelter-overnight-service-occupancy-capacity": MirroredDataset(
+        table="shelters",
+        address_column="LOCATION_ADDRESS",
+        filter_columns=["SECTOR", "OVERNIGHT_SERVICE_TYPE"],
+        max_age_seconds=6 * 3600,
+        snapshot_column="OCCUPANCY_DATE",
+        append_only=True,
+    ),
+    "earlyon-child-and-family-centres": MirroredDataset(
+        table="family_centres",
+        address_column="full_address",
+        filter_columns=["french_language_program", "indigenous_program"],
+        max_age_seconds=7 * 86400,
+        language_column="languages",
+    ),
+}
+
+
+@contextmanager
+def connect_mirror():
+    """Open the mirror database; commits on success and always closes."""
+    directory = os.path.dirname(MIRROR_DB_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(MIRROR_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _ensure_schema(conn: sqlite3.Connection, dataset: MirroredDataset):
+    conn.execute("""CREATE TABLE IF NOT EXISTS mirror_meta (
+            package_id TEXT PRIMARY KEY,
+            resource_id TEXT NOT NULL,
+            last_modified TEXT,
+            synced_at REAL NOT NULL,
+            row_count INTEGER NOT NULL
+        )""")
+
+    columns = "".join(f', "{column}" TEXT' for column in dataset.indexed_columns)
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{dataset.table}" '
+        f"(_id INTEGER PRIMARY KEY{columns}, data TEXT NOT NULL)"
+    )
+    for column in dataset.indexed_columns:
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS "idx_{dataset.table}_{column}" '
+            f'ON "{dataset.table}" ("{column}")'
+        )
+
+    if dataset.language_column:
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{dataset.table}_languages" '
+            "(_id INTEGER NOT NULL, language TEXT NOT NULL)"
+        )
+        conn.execute(
+            f'CREATE INDEX IF NOT EXISTS "idx_{dataset.table}_languages" '
+            f'ON "{dataset.table}_languages" (language COLLATE NOCASE, _id)'
+        )
+
+
+def _split_languages(value: Any) -> List[str]:
+    if not value:
+        return []
+    return [lang.strip() for lang in str(value).split(";") if lang.strip()]
+
+
+def _write_records(
+    conn: sqlite3.Connection,
+    dataset: MirroredDataset,
+    records: List[Dict[str, Any]],
+):
+    placeholders = ", ".join("?" for _ in range(len(dataset.indexed_columns) + 2))
+    columns = "".join(f', "{column}"' for column in dataset.indexed_columns)
+    conn.executemany(
+        f'INSERT OR REPLACE INTO "{dataset.table}" (_id{columns}, data) '
+        f"VALUES ({placeholders})",
+        [
+            (
+                record["_id"],
+                *(record.get(column) for column in dataset.indexed_columns),
+                json.dumps(record),
+            )
+            for record in records
+        ],
+    )
+
+    if dataset.language_column:
+        conn.executemany(
+            f'DELETE FROM "{dataset.table}_languages" WHERE _id = ?',
+            [(record["_id"],) for record in records],
+        )
+        conn.executemany(
+            f'INSERT INTO "{dataset.table}_languages" (_id, language) VALUES (?, ?)',
+            [
+                (record["_id"], language)
+                for record in records
+                for language in _split_languages(record.get(dataset.language_column))
+            ],
+        )
+
+
+def _read_meta(package_id: str) -> Optional[sqlite3.Row]:
+    if not os.path.exists(MIRROR_DB_PATH):
+        return None
+    with connect_mirror() as conn:
+        try:
+            return conn.execute(
+                "SELECT * FROM mirror_meta WHERE package_id = ?", (package_id,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+
+def mirror_info(package_id: str) -> Optional[Dict[str, Any]]:
+    """Return the sync metadata for a mirrored dataset, or None if it was never synced."""
+    meta = _read_meta(package_id)
+    return dict(meta) if meta else None
+
+
+def mirror_version(package_id: str) -> Optional[str]:
+    """Identify the mirrored content; changes whenever a sync writes new rows."""
+    meta = _read_meta(package_id)
+    if not meta:
+        return None
+    return f"{meta['resource_id']}:{meta['last_modified']}:{meta['row_count']}"
+
+
+def is_fresh(package_id: str) -> bool:
+    dataset = DATASETS.get(package_id)
+    meta = _read_meta(package_id)
+    if not dataset or not meta:
+        return False
+    return time.time() - meta["synced_at"] < dataset.max_age_seconds
+
+
+def query_mirror(
+    package_id: str, filters: Dict[str, Any], limit: int = MIRROR_RESULT_LIMIT
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answer a filtered search from the local mirror.
+
+    Returns None when the mirror cannot answer (dataset not mirrored, missing,
+    stale or filtered on an unindexed column) so the caller falls back to CKAN.
+    """
+    dataset = DATASETS.get(package_id)
+    if not dataset or not is_fresh(package_id):
+        return None
+
+    exact_filters = {k: v for k, v in filters.items() if k != dataset.language_column}
+    if any(key not in dataset.filter_columns for key in exact_filters):
+        return None
+
+    where = [f'"{key}" = ?' for key in exact_filters]
+    params: List[Any] = list(exact_filters.values())
+
+    with connect_mirror() as conn:
+        if dataset.snapshot_column:
+            where.append(
+                f'"{dataset.snapshot_column}" = '
+                f'(SELECT MAX("{dataset.snapshot_column}") FROM "{dataset.table}")'
+            )
+
+        languages_filter = (
+            filters.get(dataset.language_column) if dataset.language_column else None
+        )
+        if languages_filter:
+            wanted = [lang.lower() for lang in _split_languages(languages_filter)]
+            # The language vocabulary is tiny; resolve requested names against it
+            # (substring match, like the CKAN path) and then join on the index.
+            vocabulary = [
+                row["language"]
+                for row in conn.execute(
+                    f'SELECT DISTINCT language FROM "{dataset.table}_languages"'
+                )
+            ]
+            matched = [
+                language
+                for language in vocabulary
+                if any(lang in language.lower() for lang in wanted)
+            ]
+            if not matched:
+                return []
+            where.append(
+                f'_id IN (SELECT _id FROM "{dataset.table}_languages" '
+                f"WHERE language IN ({', '.join('?' for _ in matched)}))"
+            )
+            params.extend(matched)
+
+        sql = f'SELECT data FROM "{dataset.table}"'
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY _id LIMIT ?"
+        params.append(limit)
+
+        rows = conn.execute(sql, params).fetchall()
+
+    return [json.loads(row["data"]) for row in rows]
+
+
+def current_records(package_id: str) -> List[Dict[str, Any]]:
+    """All mirrored records a query can see (the latest snapshot, if the dataset has one)."""
+    dataset = DATASETS[package_id]
+    sql = f'SELECT data FROM "{dataset.table}"'
+    if dataset.snapshot_column:
+        sql += (
+            f' WHERE "{dataset.snapshot_column}" = '
+            f'(SELECT MAX("{dataset.snapshot_column}") FROM "{dataset.table}")'
+        )
+    with connect_mirror() as conn:
+        rows = conn.execute(sql + " ORDER BY _id").fetchall()
+    return [json.loads(row["data"]) for row in rows]
+
+
+async def _fetch_rows(
+    client: httpx.AsyncClient, resource_id: str, offset: int
+) -> tuple[List[Dict[str, Any]], int]:
+    url = CKAN_BASE_URL + "/api/3/action/datastore_search"
+    records: List[Dict[str, Any]] = []
+    total = 0
+
+    while True:
+        params = {
+            "id": resource_id,
+            "limit": MIRROR_PAGE_SIZE,
+            "offset": offset,
+            "sort": "_id asc",
+        }
+        response = await client.get(url, params=params)
+        response.raise_for_status()
+        result = response.json()["result"]
+        page = result.get("records", [])
+        total = result.get("total", total)
+        records.extend(page)
+        offset += len(page)
+        if len(page) < MIRROR_PAGE_SIZE:
+            return records, total
+
+
+async def sync_dataset(
+    package_id: str, client: Optional[httpx.AsyncClient] = None, force: bool = False
+) -> bool:
+    """
+    Bring one mirrored dataset up to date with CKAN.
+
+    Unchanged resources only have their sync time bumped. Append-only resources
+    fetch the rows past the mirrored row count; everything else is reloaded.
+    Returns True if any rows were written.
+    """
+    dataset = DATASETS[package_id]
+    client = client or get_http_client()
+
+    url = CKAN_BASE_URL + "/api/3/action/package_show"
+    package = (await client.get(url, params={"id": package_id})).json()
+    resources = package["result"]["resources"]
+    if not resources or not resources[0].get("datastore_active"):
+        logger.info(
+            "Mirror: %s has no active datastore resource, skipping.", package_id
+        )
+        return False
+
+    resource = resources[0]
+    resource_id = resource["id"]
+    last_modified = resource.get("last_modified") or package["result"].get(
+        "metadata_modified"
+    )
+
+    meta = await asyncio.to_thread(_read_meta, package_id)
+    same_resource = meta is not None and meta["resource_id"] == resource_id
+
+    if same_resource and meta["last_modified"] == last_modified and not force:
+        await asyncio.to_thread(_touch_meta, package_id)
+        logger.info("Mirror: %s unchanged since %s.", package_id, last_modified)
+        return False
+
+    incremental = same_resource and dataset.append_only and not force
+    offset = meta["row_count"] if incremental else 0
+    records, total = await _fetch_rows(client, resource_id, offset)
+
+    if incremental and total < offset:
+        # The resource was reloaded upstream with fewer rows; start over
+        logger.info("Mirror: %s shrank upstream, reloading in full.", package_id)
+        incremental = False
+        records, total = await _fetch_rows(client, resource_id, 0)
+
+    await asyncio.to_thread(
+        _store_sync,
+        package_id,
+        dataset,
+        resource_id,
+        last_modified,
+        records,
+        incremental,
+    )
+    logger.info(
+        "Mirror: synced %d rows for %s (%s, %d total).",
+        len(records),
+        package_id,
+        "incremental" if incremental else "full",
+        total,
+    )
+    return bool(records)
+
+
+def _touch_meta(package_id: str):
+    with connect_mirror() as conn:
+        conn.execute(
+            "UPDATE mirror_meta SET synced_at = ? WHERE package_id = ?",
+            (time.time(), package_id),
+        )
+
+
+def _store_sync(
+    package_id: str,
+    dataset: MirroredDataset,
+    resource_id: str,
+    last_modified: Optional[str],
+    records: List[Dict[str, Any]],
+    incremental: bool,
+):
+    with connect_mirror() as conn:
+        _ensure_schema(conn, dataset)
+        if not incremental:
+            conn.execute(f'DELETE FROM "{dataset.table}"')
+            if dataset.language_column:
+                conn.execute(f'DELETE FROM "{dataset.table}_languages"')
+        _write_records(conn, dataset, records)
+        row_count = conn.execute(f'SELECT COUNT(*) FROM "{dataset.table}"').fetchone()[
+            0
+        ]
+        conn.execute(
+            """INSERT OR REPLACE INTO mirror_meta
+               (package_id, resource_id, last_modified, synced_at, row_count)
+               VALUES (?, ?, ?, ?, ?)""",
+            (package_id, resource_id, last_modified, time.time(), row_count),
+        )
+
+
+OnSynced = Callable[[str], Awaitable[Any]]
+
+
+async def sync_all(
+    client: Optional[httpx.AsyncClient] = None,
+    force: bool = False,
+    on_synced: Optional[OnSynced] = None,
+):
+    """
+    Refresh every mirrored dataset; a failure in one does not stop the others.
+
+    `on_synced` is awaited with the package id after each successful sync, so
+    derived data (e.g. the spatial index) can be rebuilt once per refresh.
+    """
+    for package_id in DATASETS:
+        try:
+            await sync_dataset(package_id, client=client, force=force)
+            if on_synced:
+                await on_synced(package_id)
+        except Exception as e:
+            logger.warning("Mirror: error syncing %s: %s", package_id, e)
+
+
+async def run_periodic_sync(
+    interval: int = MIRROR_SYNC_INTERVAL_SECONDS, on_synced: Optional[OnSynced] = None
+):
+    """Background job that keeps the mirror fresh for the lifetime of the server."""
+    while True:
+        await sync_all(on_synced=on_synced)
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+
+    from agent_flow.log import configure_logging
+    from agent_flow.spatial_index import build_spatial_index
+
+    configure_logging()
+
+    async def _main():
+        async with new_http_client() as client:
+            await sync_all(
+                client=client,
+                force="--force" in sys.argv,
+                on_synced=build_spatial_index,
+            )
+
+    asyncio.run(_main())
@@ -1,28 +1,43 @@
 from typing import Any, Dict
 from langgraph.prebuilt import create_react_agent
-from langchain_openai import ChatOpenAI
+from agent_flow.registry import Registry, get_registry, register
 from agent_flow.tools.shelter_tools import retrieve_shelters
 from agent_flow.tools.family_center_tools import retrieve_children_family_centers
 from agent_flow.state import GraphState
 from utils.socket_context import SocketIOContext
 
+API_AGENT_PROMPT = """You look up community resources in Toronto Open Data.
+If the user's query needs more than one dataset (e.g. both shelters and EarlyON
+child and family centres), call all of the relevant tools together in the same
+response rather than one after another."""
 
-async def api_call_agent(state: GraphState) -> Dict[str, Any]:
-    await SocketIOContext.emit("update", {"message": "Searching resources"})
-
-    query = state.get("query")
-
-    model = ChatOpenAI(model="gpt-4o", temperature=0)
 
+@register("api_agent")
+def build_api_agent(registry: Registry):
     tools = [retrieve_shelters, retrieve_children_family_centers]
 
-    graph = create_react_agent(
+    # Ask for every relevant tool in a single model turn. With the v2 agent each
+    # tool call from that turn is sent to its own task, so the dataset lookups
+    # run concurrently and their api_results are merged by the state reducer.
+    model = registry.model().bind_tools(tools, parallel_tool_calls=True)
+
+    return create_react_agent(
         model,
         tools=tools,
+        prompt=API_AGENT_PROMPT,
         state_schema=GraphState,
+        version="v2",
     )
 
-    response = graph.invoke(
+
+async def api_call_agent(state: GraphState) -> Dict[str, Any]:
+    await SocketIOContext.emit("update", {"message": "Searching resources"})
+
+    query = state.get("query")
+
+    graph = get_registry()["api_agent"]
+
+    response = await graph.ainvoke(
         {
             "messages": [{"role": "user", "content": query}],
             "users_location": state.get("users_location", {}),
@@ -34,4 +49,5 @@ async def api_call_agent(state: GraphState) -> Dict[str, Any]:
     return {
         "messages": response["messages"],
         "api_results": api_results,
+        "applied_filters": response.get("applied_filters") or [],
     }
@@ -1,25 +1,56 @@
+import logging
 from typing import Any, Dict
-from langchain_openai import ChatOpenAI
+from agent_flow.helpers import DISTANCE_KEY
+from agent_flow.log import Summary
 from agent_flow.models.responses import Evaluator
+from agent_flow.prompt_format import (
+    EVALUATE_PROMPT_TOKEN_BUDGET,
+    TableSpec,
+    format_records,
+)
+from agent_flow.registry import Registry, get_registry, register
+from agent_flow.result_checks import (
+    check_relevance,
+    compute_high_occupancy,
+    evaluation_stats,
+)
 from agent_flow.state import GraphState
 from utils.socket_context import SocketIOContext
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 
+logger = logging.getLogger(__name__)
 
-async def evaluate_api_results(state: GraphState) -> Dict[str, Any]:
-    """Evaluates API results to decide if a web search is needed."""
-    await SocketIOContext.emit("update", {"message": "Evaluating results"})
+# Only what relevance and occupancy depend on; contact details are not needed
+EVALUATE_TABLES = [
+    TableSpec(
+        "Shelters",
+        "LOCATION_ADDRESS",
+        [
+            "LOCATION_NAME",
+            "SECTOR",
+            "OVERNIGHT_SERVICE_TYPE",
+            "PROGRAM_MODEL",
+            "OCCUPANCY_RATE_ROOMS",
+            DISTANCE_KEY,
+        ],
+    ),
+    TableSpec(
+        "EarlyON child and family centres",
+        "full_address",
+        [
+            "program_name",
+            "languages",
+            "french_language_program",
+            "indigenous_program",
+            DISTANCE_KEY,
+        ],
+    ),
+]
 
-    api_results = state.get("api_results")
-    print(f"API results from evaluator: {api_results}")
-    query = state.get("query")
-
-    # Handle case where the previous node found nothing
-    if not api_results:
-        print("No API results found. Forcing web search.")
-        return {"use_search": True, "is_high_occupancy": False}
 
+@register("evaluate")
+def build_evaluate_chain(registry: Registry):
     system_msg = (
         "Evaluate the API results based on the user's query to determine if further search is needed. "
         "You MUST populate 'should_google' (boolean) and 'is_high_occupancy' (boolean). \n"
@@ -34,7 +65,6 @@ async def evaluate_api_results(state: GraphState) -> Dict[str, Any]:
         "\nProvide ONLY the JSON for 'should_google' and 'is_high_occupancy' based on the Evaluator model."
     )
 
-    model = ChatOpenAI(model="gpt-4o", temperature=0)
     parser = PydanticOutputParser(pydantic_object=Evaluator)
 
     prompt = PromptTemplate(
@@ -42,15 +72,55 @@ async def evaluate_api_results(state: GraphState) -> Dict[str, Any]:
         input_variables=["user_query", "api_results"],
     )
 
-    llm_with_parser = prompt | model | parser
+    return prompt | registry.model() | parser
+
+
+async def evaluate_api_results(state: GraphState) -> Dict[str, Any]:
+    """Evaluates API results to decide if a web search is needed."""
+    await SocketIOContext.emit("update", {"message": "Evaluating results"})
+
+    api_results = state.get("api_results")
+    logger.debug("API results from evaluator: %s", Summary(api_results))
+    query = state.get("query")
+
+    # Handle case where the previous node found nothing
+    if not api_results:
+        logger.debug("No API results found. Forcing web search.")
+        return {"use_search": True, "is_high_occupancy": False}
+
+    # Occupancy is arithmetic and relevance is usually clear from the filters
+    # and distances; only ask the LLM when either check is inconclusive
+    is_high_occupancy = compute_high_occupancy(api_results)
+    is_relevant = check_relevance(
+        api_results,
+        state.get("applied_filters") or [],
+        has_location=bool(state.get("users_location")),
+    )
+    escalate = is_high_occupancy is None or is_relevant is None
+    evaluation_stats.record(escalate)
+
+    if escalate:
+        llm_with_parser = get_registry()["evaluate"]
+
+        results = format_records(
+            "evaluate", api_results, EVALUATE_TABLES, EVALUATE_PROMPT_TOKEN_BUDGET
+        )
+
+        response = await llm_with_parser.ainvoke(
+            {"user_query": query, "api_results": results}
+        )
 
-    response = llm_with_parser.invoke({"user_query": query, "api_results": api_results})
+        if is_high_occupancy is None:
+            is_high_occupancy = response.is_high_occupancy
+        if is_relevant is None:
+            is_relevant = not response.should_google
 
-    should_google = response.should_google
-    is_high_occupancy = response.is_high_occupancy
+    should_google = not is_relevant
 
-    print(
-        f"Evaluation complete. Should Google: {should_google}, Is High Occupancy: {is_high_occupancy}"
+    logger.debug(
+        "Evaluation complete. Should Google: %s, Is High Occupancy: %s",
+        should_google,
+        is_high_occupancy,
     )
 
     return {
@@ -1,28 +1,47 @@
-from typing import Any, Dict
-from langchain_openai import ChatOpenAI
-from langchain_core.output_parsers import PydanticOutputParser
+import logging
+from typing import Any, Dict, List
+from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import AIMessage
-from agent_flow.models.responses import AgentResponse
+from pydantic import ValidationError
+from agent_flow.helpers import DISTANCE_KEY
+from agent_flow.models.responses import AgentResponse, ContactInfo
+from agent_flow.prompt_format import (
+    GENERATE_PROMPT_TOKEN_BUDGET,
+    TableSpec,
+    format_records,
+)
+from agent_flow.registry import Registry, get_registry, register
+from agent_flow.response_cache import store_response
 from agent_flow.state import GraphState
+from agent_flow.tools.family_center_tools import EVALUATOR_ESSENTIAL_FAMILY_CENTER_KEYS
+from agent_flow.tools.shelter_tools import EVALUATOR_ESSENTIAL_SHELTER_KEYS
 from utils.socket_context import SocketIOContext
 
+logger = logging.getLogger(__name__)
 
+# Everything the response can quote: names, addresses and contact details
+GENERATE_TABLES = [
+    TableSpec(
+        "Shelters",
+        "LOCATION_ADDRESS",
+        EVALUATOR_ESSENTIAL_SHELTER_KEYS + [DISTANCE_KEY],
+    ),
+    TableSpec(
+        "EarlyON child and family centres",
+        "full_address",
+        EVALUATOR_ESSENTIAL_FAMILY_CENTER_KEYS + [DISTANCE_KEY],
+    ),
+    TableSpec(
+        "Google Maps places",
+        "address",
+        ["name", "address", "phone_number", "website", "url"],
+    ),
+]
 
-async def generate_final_response(state: GraphState) -> Dict[str, Any]:
-    await SocketIOContext.emit("update", {"message": "Generating final response"})
-    print("GENERATING FINAL RESPONSE...")
-
-    if state.get("is_valid_query") != "VALID":
-        print("Query is invalid, skipping final response generation.")
-        return {
-            "messages": state.get("messages", []),
-            "structured_response": None,
-            "error_response": "Sorry! Please try again with a different query.",
-        }
-
-    model = ChatOpenAI(model="gpt-4o", temperature=0)
 
+@register("generate")
+def build_generate_chain(registry: Registry):
     parser = PydanticOutputParser(pydantic_object=AgentResponse)
 
     prompt = PromptTemplate(
@@ -34,14 +53,115 @@ async def generate_final_response(state: GraphState) -> Dict[str, Any]:
         partial_variables={"format_instructions": parser.get_format_instructions()},
     )
 
-    llm_with_parser = prompt | model | parser
+    # Parse the JSON as it streams in so resources can be sent before the
+    # whole response is done; the result is validated as AgentResponse at the end.
+    return prompt | registry.model() | JsonOutputParser(pydantic_object=AgentResponse)
+
+
+def _addresses(partial: Any) -> List[Any]:
+    addresses = partial.get("addresses") if isinstance(partial, dict) else None
+    return addresses if isinstance(addresses, list) else []
+
+
+def _is_contact_info(entry: Any) -> bool:
+    try:
+        ContactInfo.model_validate(entry)
+    except ValidationError:
+        return False
+    return True
+
+
+def _completed_addresses(
+    partial: Dict[str, Any], previous: Dict[str, Any], done: bool
+) -> List[Dict[str, Any]]:
+    """
+    ContactInfo entries that the model has finished writing.
+
+    An entry is finished once a later entry has started, or once the output
+    changed elsewhere while the entry stayed the same (the parser only yields
+    on change, so the model has moved past it), whatever order the keys come
+    in. Only a leading run of entries that validate as ContactInfo is
+    returned, so half-written entries are never sent.
+    """
+    addresses = _addresses(partial)
+    if done:
+        finished = addresses
+    elif addresses and _addresses(previous)[-1:] == addresses[-1:]:
+        finished = addresses
+    else:
+        finished = addresses[:-1]
+
+    completed = []
+    for entry in finished:
+        if not _is_contact_info(entry):
+            break
+        completed.append(entry)
+    return completed
+
+
+async def stream_response(llm_with_parser, results) -> AgentResponse:
+    """
+    Stream the generated response, emitting `partial_res` events as each
+    ContactInfo entry completes and as the feedback text grows.
+    """
+    sent = 0
+    feedback = ""
+    partial: Dict[str, Any] = {}
+    previous: Dict[str, Any] = {}
+
+    async for partial in llm_with_parser.astream({"results": results}):
+        if not isinstance(partial, dict):
+            continue
+
+        new_addresses = _completed_addresses(partial, previous, done=False)[sent:]
+        previous = partial
+        new_feedback = partial.get("feedback") or ""
+        if not new_addresses and new_feedback == feedback:
+            continue
+
+        await SocketIOContext.emit(
+            "partial_res",
+            {"index": sent, "addresses": new_addresses, "feedback": new_feedback},
+        )
+        sent += len(new_addresses)
+        feedback = new_feedback
+
+    remaining = _completed_addresses(partial, previous, done=True)[sent:]
+    if remaining:
+        await SocketIOContext.emit(
+            "partial_res",
+            {"index": sent, "addresses": remaining, "feedback": feedback},
+        )
+
+    return AgentResponse.model_validate(partial)
+
+
+async def generate_final_response(state: GraphState) -> Dict[str, Any]:
+    await SocketIOContext.emit("update", {"message": "Generating final response"})
+    logger.debug("Generating final response")
+
+    if state.get("is_valid_query") != "VALID":
+        logger.debug("Query is invalid, skipping final response generation.")
+        return {
+            "messages": state.get("messages", []),
+            "structured_response": None,
+            "error_response": "Sorry! Please try again with a different query.",
+        }
+
+    llm_with_parser = get_registry()["generate"]
 
     if state.get("use_search"):
         results = state.get("search_results")
     else:
         results = state.get("api_results")
 
-    output = llm_with_parser.invoke({"results": results})
+    results = format_records(
+        "generate", results, GENERATE_TABLES, GENERATE_PROMPT_TOKEN_BUDGET
+    )
+
+    output = await stream_response(llm_with_parser, results)
+
+    await store_response(state, output.model_dump())
 
     messages = state.get("messages") or []
     messages.append(AIMessage("Finished generating response"))
@@ -1,16 +1,20 @@
+import logging
+from agent_flow.query_classifier import (
+    QUERY_VALIDATION_CONFIDENCE,
+    classifier_stats,
+    classify_query,
+)
 from agent_flow.state import GraphState
-from langchain_openai import ChatOpenAI
+from agent_flow.registry import Registry, get_registry, register
 from langchain_core.prompts import PromptTemplate
 from langchain_core.messages import AIMessage
 from utils.socket_context import SocketIOContext
 
+logger = logging.getLogger(__name__)
 
-async def query_validation(state: GraphState) -> GraphState:
-    await SocketIOContext.emit("update", {"message": "Validating query"})
-    query = state.get("query")
-
-    model = ChatOpenAI(model="gpt-4o", temperature=0)
 
+@register("query_validation")
+def build_validation_chain(registry: Registry):
     prompt = PromptTemplate(
         template="""Classify if this query is about community/social support services.
 
@@ -24,15 +28,36 @@ async def query_validation(state: GraphState) -> GraphState:
         input_variables=["query"],
     )
 
-    llm_with_prompt = prompt | model
+    return prompt | registry.model()
 
-    output = llm_with_prompt.invoke({"query": query})
 
-    print(f"Validation output: {output.content}")
+async def query_validation(state: GraphState) -> GraphState:
+    await SocketIOContext.emit("update", {"message": "Validating query"})
+    query = state.get("query")
+
+    classification = classify_query(query)
+    escalated = classification.confidence < QUERY_VALIDATION_CONFIDENCE
+
+    if escalated:
+        llm_with_prompt = get_registry()["query_validation"]
+
+        output = await llm_with_prompt.ainvoke({"query": query})
+        is_valid_query = output.content
+    else:
+        is_valid_query = classification.label
+
+    classifier_stats.record(is_valid_query, escalated)
+
+    logger.debug(
+        "Validation output: %s (%s, confidence %.2f)",
+        is_valid_query,
+        "LLM" if escalated else "local",
+        classification.confidence,
+    )
 
     messages = state.get("messages") or []
     messages.append(AIMessage("Finished validating query"))
 
     await SocketIOContext.emit("update", {"message": "Finished query validation"})
 
-    return {"messages": messages, "is_valid_query": output.content}
+    return {"messages": messages, "is_valid_query": is_valid_query}
@@ -1,12 +1,12 @@
 import os
 import json
+import logging
 from typing import Dict, Any
 from dotenv import load_dotenv
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-
-import googlemaps
 
+from agent_flow.places import search_places_with_details
+from agent_flow.registry import Registry, get_registry, register
 from agent_flow.state import GraphState
 
 from utils.socket_context import SocketIOContext
@@ -14,23 +14,11 @@ from utils.socket_context import SocketIOContext
 
 load_dotenv()
 
-# Initialize Google Maps client with API key
-googlemaps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
-gmaps = googlemaps.Client(key=googlemaps_api_key)
-print("Using Google Maps with API key authentication")
-
-
-async def web_search(state: GraphState) -> Dict[str, Any]:
-    await SocketIOContext.emit("update", {"message": "Further searching"})
-    print("SEARCHING GOOGLE MAPS...")
-
-    query = state["query"]
+logger = logging.getLogger(__name__)
 
-    if state.get("users_location") != {}:
-        query += (
-            f" near {state['users_location']['lat']}, {state['users_location']['lng']}"
-        )
 
+@register("search_query")
+def build_search_query_chain(registry: Registry):
     generate_location_prompt = ChatPromptTemplate(
         [
             (
@@ -41,69 +29,28 @@ async def web_search(state: GraphState) -> Dict[str, Any]:
         ]
     )
 
-    llm = ChatOpenAI(temperature=0)
+    return generate_location_prompt | registry.model("gpt-3.5-turbo")
+
 
-    generate_query_chain = generate_location_prompt | llm
+async def web_search(state: GraphState) -> Dict[str, Any]:
+    await SocketIOContext.emit("update", {"message": "Further searching"})
+    logger.debug("Searching Google Maps")
 
-    result = generate_query_chain.invoke({"query": query})
+    query = state["query"]
 
-    final_search_query = result.content
+    if state.get("users_location") != {}:
+        query += (
+            f" near {state['users_location']['lat']}, {state['users_location']['lng']}"
+        )
 
-    print("FINAL SEARCH QUERY:", final_search_query)
+    generate_query_chain = get_registry()["search_query"]
 
-    # GTA center point for location bias (Downtown Toronto)
-    gta_center = {"lat": 43.6532, "lng": -79.3832}
+    result = await generate_query_chain.ainvoke({"query": query})
 
-    # Initial places search with GTA location bias and bounds
-    places_result = gmaps.places(
-        query=final_search_query,
-        location=gta_center,
-        radius=50000,  # 50km radius from center
-        region="ca",
-    )
+    final_search_query = result.content
+
+    logger.debug("Final search query: %s", final_search_query)
+
+    detailed_results = await search_places_with_details(final_search_query)
 
-    places_result = gmaps.places(query=final_search_query)
-
-    detailed_results = []
-
-    for place in places_result["results"]:
-        try:
-            place_id = place["place_id"]
-
-            place_details = gmaps.place(
-                place_id=place_id,
-                fields=[
-                    "name",
-                    "formatted_phone_number",
-                    "website",
-                    "url",
-                    "formatted_address",
-                ],
-            )
-
-            details = place_details["result"]
-
-            detailed_place = {
-                "name": details.get("name"),
-                "phone_number": details.get("formatted_phone_number"),
-                "website": details.get("website"),
-                "url": details.get("url"),
-                "address": details.get("formatted_address"),
-            }
-
-            detailed_results.append(detailed_place)
-        except Exception as e:
-            print(
-                f"Error getting details for place {place.get('name', 'Unknown')}: {e}"
-            )
-            detailed_results.append(
-                {
-                    "name": place.get("name"),
-                    "address": place.get("formatted_address"),
-                    "rating": place.get("rating"),
-                    "place_id": place.get("place_id"),
-                    "error": "Could not fetch detailed contact information",
-                }
-            )
-
-    return {"search_results": detailed_results[:6]}
+    return {"search_results": detailed_results}
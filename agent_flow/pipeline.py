@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+from utils.socket_context import SocketIOContext
+from .graph import app
+from .log import Summary, bind_request_id
+from .metrics import queries_in_flight, queries_total
+from .response_cache import get_cached_response
+
+logger = logging.getLogger(__name__)
+
+
+async def answer_query(
+    sio,
+    sid: str,
+    query: str,
+    location: Optional[Dict[str, Any]],
+    request_id: Optional[str] = None,
+):
+    """
+    Run one query through the graph and emit the answer to `sid`.
+
+    `sio` is the Socket.IO server, or a write-only client manager when the
+    graph runs in a worker process; both deliver `emit(..., room=sid)`.
+    """
+    bind_request_id(request_id)
+    logger.debug("Answering query %r at %s", query, location)
+
+    SocketIOContext.set_context(sio, sid)
+    queries_in_flight.inc()
+    start = time.perf_counter()
+    source = "error"
+
+    try:
+        cached_response = await get_cached_response(query, location)
+        if cached_response is not None:
+            source = "cache"
+            queries_total.inc("cache")
+            await sio.emit(
+                "final_res",
+                {"message": json.dumps(cached_response)},
+                room=sid,
+            )
+            return
+
+        async for chunk in app.astream(
+            {"query": query, "users_location": location}, stream_mode="updates"
+        ):
+            curr_chunk = chunk
+            first_key = list(curr_chunk.keys())[0]
+
+            # await sio.emit("update", {"message": f"finished {first_key}"}, room=sid)
+
+            if first_key == "generate":
+                if "error_response" in curr_chunk[first_key]:
+                    error_response = curr_chunk[first_key]["error_response"]
+                    logger.debug("Rejected query: %s", error_response)
+                    source = "rejected"
+                    queries_total.inc("rejected")
+
+                    await sio.emit(
+                        "final_res",
+                        {"message": "", "error_msg": error_response},
+                        room=sid,
+                    )
+                    return
+
+                structured_response = curr_chunk[first_key]["structured_response"]
+
+                logger.debug("Structured response: %s", Summary(structured_response))
+
+                if hasattr(structured_response, "dict"):
+                    response_dict = structured_response.dict()
+                elif hasattr(structured_response, "to_dict"):
+                    response_dict = structured_response.to_dict()
+                else:
+                    response_dict = vars(structured_response)
+
+                await sio.emit(
+                    "final_res",
+                    {"message": json.dumps(response_dict)},
+                    room=sid,
+                )
+
+        source = "graph"
+        queries_total.inc("graph")
+
+    except asyncio.CancelledError:
+        source = "cancelled"
+        raise
+    except Exception as e:
+        queries_total.inc("error")
+        await SocketIOContext.emit("error", {"message": str(e)})
+        logger.exception("Error answering query")
+        await sio.emit(
+            "final_res",
+            {"message": "", "error_msg": str(e)},
+            room=sid,
+        )
+    finally:
+        queries_in_flight.dec()
+        logger.info(
+            "Query answered",
+            extra={
+                "sid": sid,
+                "source": source,
+                "duration_ms": round((time.perf_counter() - start) * 1000),
+            },
+        )
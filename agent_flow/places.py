@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List
+from .cache import cache
+from .executor import run_blocking
+from .helpers import gmaps
+from .metrics import track_dependency
+
+logger = logging.getLogger(__name__)
+
+# GTA center point for location bias (Downtown Toronto)
+GTA_CENTER = {"lat": 43.6532, "lng": -79.3832}
+GTA_RADIUS_METERS = 50000
+
+# Only this many candidates get a (billed) details lookup
+PLACES_DETAILS_LIMIT = int(os.getenv("PLACES_DETAILS_LIMIT", "6"))
+# Names, phone numbers and websites of places rarely change
+PLACE_DETAILS_CACHE_TTL = int(os.getenv("PLACE_DETAILS_CACHE_TTL", str(7 * 86400)))
+
+PLACE_DETAILS_FIELDS = [
+    "name",
+    "formatted_phone_number",
+    "website",
+    "url",
+    "formatted_address",
+]
+
+
+def _text_search(query: str) -> Dict[str, Any]:
+    with track_dependency("google_places"):
+        return gmaps.places(
+            query=query, location=GTA_CENTER, radius=GTA_RADIUS_METERS, region="ca"
+        )
+
+
+async def search_places(query: str) -> List[Dict[str, Any]]:
+    """Text search biased towards the GTA."""
+    places_result = await run_blocking(_text_search, query)
+    return places_result.get("results", [])
+
+
+def _place_details_uncached(place_id: str) -> Dict[str, Any]:
+    with track_dependency("google_places"):
+        response = gmaps.place(place_id=place_id, fields=PLACE_DETAILS_FIELDS)
+    details = response["result"]
+    return {
+        "name": details.get("name"),
+        "phone_number": details.get("formatted_phone_number"),
+        "website": details.get("website"),
+        "url": details.get("url"),
+        "address": details.get("formatted_address"),
+    }
+
+
+async def place_details(place: Dict[str, Any]) -> Dict[str, Any]:
+    """Contact details for a search result, cached by place_id."""
+    place_id = place["place_id"]
+    try:
+        return await cache.get_or_fetch(
+            f"place_details:{place_id}",
+            lambda: run_blocking(_place_details_uncached, place_id),
+            expire=PLACE_DETAILS_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.warning(
+            "Error getting details for place %s: %s", place.get("name", "Unknown"), e
+        )
+        return {
+            "name": place.get("name"),
+            "address": place.get("formatted_address"),
+            "rating": place.get("rating"),
+            "place_id": place_id,
+            "error": "Could not fetch detailed contact information",
+        }
+
+
+async def search_places_with_details(
+    query: str, limit: int = PLACES_DETAILS_LIMIT
+) -> List[Dict[str, Any]]:
+    """
+    One biased text search, then details for the top `limit` results, fetched
+    concurrently and served from the cache where possible.
+    """
+    places = [place for place in await search_places(query) if place.get("place_id")]
+    return await asyncio.gather(*(place_details(place) for place in places[:limit]))
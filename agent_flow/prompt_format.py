@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from .executor import submit_blocking
+
+logger = logging.getLogger(__name__)
+
+EVALUATE_PROMPT_TOKEN_BUDGET = int(os.getenv("EVALUATE_PROMPT_TOKEN_BUDGET", "1500"))
+GENERATE_PROMPT_TOKEN_BUDGET = int(os.getenv("GENERATE_PROMPT_TOKEN_BUDGET", "3000"))
+# How long to estimate token counts before trying to load the encoding again
+TOKEN_ENCODER_RETRY_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class TableSpec:
+    """Which records go in a table (those with `marker`) and which fields it shows."""
+
+    title: str
+    marker: str
+    fields: Sequence[str]
+
+
+_encode: Optional[Callable[[str], list]] = None
+_encoder_lock = threading.Lock()
+_encoder_retry_at = 0.0
+
+
+def load_token_encoder() -> bool:
+    """
+    Load the gpt-4o encoding (blocking: it may download the BPE file on first
+    use). Call at startup, off the event loop.
+    """
+    global _encode, _encoder_retry_at
+    if _encode is not None:
+        return True
+    with _encoder_lock:
+        if _encode is not None:
+            return True
+        try:
+            import tiktoken
+
+            _encode = tiktoken.encoding_for_model("gpt-4o").encode
+            return True
+        except Exception as e:
+            _encoder_retry_at = time.monotonic() + TOKEN_ENCODER_RETRY_SECONDS
+            logger.warning(
+                "Could not load the tiktoken encoding; estimating tokens as "
+                "chars/4 and retrying in %ds. Error: %s",
+                TOKEN_ENCODER_RETRY_SECONDS,
+                e,
+            )
+            return False
+
+
+def count_tokens(text: str) -> int:
+    """
+    Token count with the gpt-4o encoding, or a chars/4 estimate until it has
+    been loaded. Never loads the encoding itself; a failed load is retried in
+    the background.
+    """
+    global _encoder_retry_at
+    if _encode is not None:
+        return len(_encode(text))
+    if _encoder_retry_at and time.monotonic() >= _encoder_retry_at:
+        _encoder_retry_at = time.monotonic() + TOKEN_ENCODER_RETRY_SECONDS
+        submit_blocking(load_token_encoder)
+    return (len(text) + 3) // 4
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def _render(tables: List[tuple], omitted: int) -> str:
+    blocks = []
+    for title, fields, rows in tables:
+        if not rows:
+            continue
+        lines = [f"{title}:", " | ".join(fields)]
+        lines.extend(" | ".join(_cell(row.get(f)) for f in fields) for row in rows)
+        blocks.append("\n".join(lines))
+    if omitted:
+        blocks.append(f"({omitted} lower-ranked results omitted)")
+    return "\n\n".join(blocks) if blocks else "No results."
+
+
+def _group(records: List[Dict[str, Any]], specs: Sequence[TableSpec]) -> List[tuple]:
+    tables = [(spec.title, list(spec.fields), []) for spec in specs]
+    other: List[Dict[str, Any]] = []
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        for spec, table in zip(specs, tables):
+            if spec.marker in record:
+                table[2].append(record)
+                break
+        else:
+            other.append(record)
+    if other:
+        fields = list(dict.fromkeys(key for record in other for key in record))
+        tables.append(("Results", fields, other))
+    # Only keep columns that at least one record fills in
+    return [
+        (
+            title,
+            [f for f in fields if any(r.get(f) not in (None, "") for r in rows)],
+            rows,
+        )
+        for title, fields, rows in tables
+    ]
+
+
+class PromptStats:
+    """Per-node prompt sizes: what the raw repr would have cost vs what was sent."""
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, int]] = {}
+
+    def record(self, node: str, raw_tokens: int, sent_tokens: int, dropped: int):
+        stats = self.nodes.setdefault(
+            node,
+            {"requests": 0, "raw_tokens": 0, "sent_tokens": 0, "records_dropped": 0},
+        )
+        stats["requests"] += 1
+        stats["raw_tokens"] += raw_tokens
+        stats["sent_tokens"] += sent_tokens
+        stats["records_dropped"] += dropped
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {
+            node: {**stats, "tokens_saved": stats["raw_tokens"] - stats["sent_tokens"]}
+            for node, stats in self.nodes.items()
+        }
+
+
+prompt_stats = PromptStats()
+
+
+def format_records(
+    node: str,
+    records: Optional[List[Dict[str, Any]]],
+    specs: Sequence[TableSpec],
+    token_budget: int,
+) -> str:
+    """
+    Render records as compact tables (a header row, then values only).
+
+    Records are assumed to be ranked best first. While the text is over
+    `token_budget`, the last record of the longest table is dropped, so every
+    dataset keeps its best matches.
+    """
+    records = records or []
+    tables = _group(records, specs)
+
+    omitted = 0
+    text = _render(tables, omitted)
+    while count_tokens(text) > token_budget:
+        longest = max(tables, key=lambda table: len(table[2]), default=None)
+        if longest is None or len(longest[2]) <= 1:
+            break
+        longest[2].pop()
+        omitted += 1
+        text = _render(tables, omitted)
+
+    raw_tokens = count_tokens(str(records))
+    sent_tokens = count_tokens(text)
+    prompt_stats.record(node, raw_tokens, sent_tokens, omitted)
+    logger.debug(
+        "%s prompt: %d tokens for results (repr would be %d; %d records dropped)",
+        node,
+        sent_tokens,
+        raw_tokens,
+        omitted,
+    )
+    return text
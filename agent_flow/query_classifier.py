@@ -0,0 +1,260 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+from .helpers import nlp
+from .scheduler import PRIORITY_CRISIS, PRIORITY_DEFAULT, PRIORITY_LOW
+
+# Queries the local classifier is at least this sure about skip the LLM
+QUERY_VALIDATION_CONFIDENCE = float(os.getenv("QUERY_VALIDATION_CONFIDENCE", "0.75"))
+
+# Lemmatised terms with weights: 2 for terms that decide a query on their own,
+# 1 for terms that usually do, 0.5 for terms that only lean one way.
+SERVICE_TERMS: Dict[str, float] = {
+    "shelter": 2,
+    "homeless": 2,
+    "homelessness": 2,
+    "food bank": 2,
+    "food pantry": 2,
+    "soup kitchen": 2,
+    "meal program": 2,
+    "drop-in": 1,
+    "respite": 2,
+    "warming centre": 2,
+    "warming center": 2,
+    "cooling centre": 2,
+    "child care": 2,
+    "childcare": 2,
+    "daycare": 2,
+    "day care": 2,
+    "earlyon": 2,
+    "family centre": 2,
+    "family center": 2,
+    "child and family": 2,
+    "parenting": 1,
+    "playgroup": 1,
+    "health clinic": 2,
+    "community health": 2,
+    "walk-in clinic": 2,
+    "clinic": 1,
+    "mental health": 2,
+    "counselling": 2,
+    "counseling": 2,
+    "therapy": 1,
+    "addiction": 2,
+    "harm reduction": 2,
+    "detox": 2,
+    "crisis": 2,
+    "suicide": 2,
+    "abuse": 2,
+    "domestic violence": 2,
+    "assault": 1,
+    "legal aid": 2,
+    "legal clinic": 2,
+    "housing": 2,
+    "affordable housing": 2,
+    "rent": 1,
+    "eviction": 2,
+    "job training": 2,
+    "employment service": 2,
+    "employment": 1,
+    "job": 0.5,
+    "disability": 2,
+    "accessibility": 1,
+    "senior": 1,
+    "elderly": 1,
+    "indigenous": 1,
+    "immigrant": 1,
+    "newcomer": 1,
+    "refugee": 2,
+    "veteran": 1,
+    "lgbtq": 1,
+    "youth": 0.5,
+    "women": 0.5,
+    "social service": 2,
+    "community service": 2,
+    "support service": 1,
+    "settlement": 1,
+    "welfare": 2,
+    "social assistance": 2,
+    "ontario works": 2,
+    "support": 0.5,
+    "help": 0.5,
+    "free": 0.5,
+    "emergency": 1,
+}
+
+COMMERCIAL_TERMS: Dict[str, float] = {
+    "restaurant": 2,
+    "takeout": 2,
+    "delivery": 1,
+    "pizza": 2,
+    "sushi": 2,
+    "burger": 2,
+    "brunch": 2,
+    "cafe": 1,
+    "coffee shop": 2,
+    "bar": 1,
+    "pub": 2,
+    "nightclub": 2,
+    "club": 0.5,
+    "hotel booking": 2,
+    "book a hotel": 2,
+    "resort": 2,
+    "airbnb": 2,
+    "vacation": 2,
+    "spa": 2,
+    "salon": 2,
+    "shopping": 2,
+    "mall": 2,
+    "store": 1,
+    "buy": 1,
+    "cheap": 0.5,
+    "deal": 1,
+    "discount": 1,
+    "movie": 2,
+    "cinema": 2,
+    "concert": 2,
+    "ticket": 1,
+    "museum": 1,
+    "tourist": 2,
+    "attraction": 1,
+    "gym": 1,
+    "car rental": 2,
+    "dealership": 2,
+    "real estate": 2,
+    "condo for sale": 2,
+}
+
+# Queries about a place to sleep tonight or immediate danger jump the queue
+URGENT_TERMS: Dict[str, float] = {
+    term: 1
+    for term in (
+        "shelter", "homeless", "respite", "warming centre", "warming center",
+        "crisis", "emergency", "suicide", "abuse", "domestic violence",
+        "assault", "detox", "overdose", "tonight", "unsafe", "evicted",
+    )
+}  # fmt: skip
+
+# Only affect the queue when nothing urgent is mentioned
+LOW_PRIORITY_TERMS: Dict[str, float] = {
+    term: 1
+    for term in (
+        "earlyon", "family centre", "family center", "child and family",
+        "playgroup", "parenting",
+    )
+}  # fmt: skip
+
+# How far apart the two scores must be before a decision is trusted
+_CONFIDENCE_DAMPING = 0.5
+
+
+def _compile(terms: Dict[str, float]) -> Tuple[re.Pattern, Dict[str, float]]:
+    alternatives = sorted(terms, key=len, reverse=True)
+    pattern = re.compile(
+        r"(?<![\w-])("
+        + "|".join(re.escape(term) for term in alternatives)
+        + r")(?![\w-])"
+    )
+    return pattern, terms
+
+
+_UNUSED_PIPES = [
+    name for name in ("parser", "ner") if nlp is not None and name in nlp.pipe_names
+]
+_SERVICE_PATTERN = _compile(SERVICE_TERMS)
+_COMMERCIAL_PATTERN = _compile(COMMERCIAL_TERMS)
+_URGENT_PATTERN = _compile(URGENT_TERMS)
+_LOW_PRIORITY_PATTERN = _compile(LOW_PRIORITY_TERMS)
+
+
+def _normalize(query: str) -> List[str]:
+    """Return the forms of the query to match against: raw lowercase and lemmatised."""
+    text = query.lower()
+    forms = [text]
+    if nlp is not None:
+        # Only lemmas are needed; skip the parser and NER
+        with nlp.select_pipes(disable=_UNUSED_PIPES):
+            doc = nlp(text)
+        forms.append(" ".join(token.lemma_ for token in doc))
+    else:
+        # Without spaCy, strip plural "s" so "shelters" still matches "shelter"
+        forms.append(re.sub(r"(\w{3,})s\b", r"\1", text))
+    return forms
+
+
+def _score(forms: List[str], compiled: Tuple[re.Pattern, Dict[str, float]]) -> float:
+    pattern, weights = compiled
+    matched = set()
+    for form in forms:
+        matched.update(match.group(1) for match in pattern.finditer(form))
+    return sum(weights[term] for term in matched)
+
+
+@dataclass
+class Classification:
+    label: str  # "VALID" or "INVALID"
+    confidence: float
+    service_score: float
+    commercial_score: float
+
+
+def classify_query(query: str) -> Classification:
+    """
+    Score a query against the service and commercial lexicons.
+
+    Confidence is the margin between the two scores relative to their total,
+    so a query matching neither lexicon, or both about equally, scores near
+    zero and should be escalated to the LLM.
+    """
+    forms = _normalize(query or "")
+    service = _score(forms, _SERVICE_PATTERN)
+    commercial = _score(forms, _COMMERCIAL_PATTERN)
+
+    confidence = abs(service - commercial) / (
+        service + commercial + _CONFIDENCE_DAMPING
+    )
+    label = "VALID" if service > commercial else "INVALID"
+    return Classification(label, confidence, service, commercial)
+
+
+def query_priority(query: str) -> int:
+    """Admission priority for a query: shelter/crisis first, EarlyON last."""
+    text = (query or "").lower()
+    # No spaCy here: this runs for every submission, before admission
+    forms = [text, re.sub(r"(\w{3,})s\b", r"\1", text)]
+    if _score(forms, _URGENT_PATTERN):
+        return PRIORITY_CRISIS
+    if _score(forms, _LOW_PRIORITY_PATTERN):
+        return PRIORITY_LOW
+    return PRIORITY_DEFAULT
+
+
+class ClassifierStats:
+    """Counts how often query validation was decided locally vs by the LLM."""
+
+    def __init__(self):
+        self.local_valid = 0
+        self.local_invalid = 0
+        self.escalated = 0
+
+    def record(self, label: str, escalated: bool):
+        if escalated:
+            self.escalated += 1
+        elif label == "VALID":
+            self.local_valid += 1
+        else:
+            self.local_invalid += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        local = self.local_valid + self.local_invalid
+        total = local + self.escalated
+        return {
+            "local_valid": self.local_valid,
+            "local_invalid": self.local_invalid,
+            "escalated": self.escalated,
+            "skip_ratio": local / total if total else 0.0,
+        }
+
+
+classifier_stats = ClassifierStats()
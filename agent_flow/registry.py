@@ -0,0 +1,116 @@
+import importlib.util
+import os
+from typing import Callable, Dict, Optional, Tuple
+import httpx
+from dotenv import load_dotenv
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from .metrics import AsyncTimedTransport, TimedTransport
+
+load_dotenv()
+
+# HTTP/2 multiplexing needs the optional `h2` package; without it the shared
+# clients still reuse HTTP/1.1 keep-alive connections.
+OPENAI_HTTP2 = importlib.util.find_spec("h2") is not None
+OPENAI_TIMEOUT = httpx.Timeout(
+    float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60")), connect=5.0
+)
+OPENAI_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+    keepalive_expiry=120.0,
+)
+
+DEFAULT_MODEL = "gpt-4o"
+
+RunnableBuilder = Callable[["Registry"], Runnable]
+
+_builders: Dict[str, RunnableBuilder] = {}
+
+
+def register(name: str):
+    """
+    Register a builder for a chain or compiled graph under `name`.
+
+    Nodes and tools decorate the function that assembles their prompt | model |
+    parser chain; the registry calls it once and hands out the result.
+    """
+
+    def decorator(builder: RunnableBuilder) -> RunnableBuilder:
+        _builders[name] = builder
+        return builder
+
+    return decorator
+
+
+class Registry:
+    """
+    Process-wide owner of LLM clients, prompt chains and compiled sub-graphs.
+
+    Built once at startup so requests reuse the same ChatOpenAI instances and
+    their pooled HTTP connections instead of rebuilding them per call.
+    """
+
+    def __init__(self):
+        # The pool settings live on the transports, which the clients use as given
+        self.http_client = httpx.Client(
+            timeout=OPENAI_TIMEOUT,
+            transport=TimedTransport(
+                httpx.HTTPTransport(http2=OPENAI_HTTP2, limits=OPENAI_LIMITS),
+                "openai",
+            ),
+        )
+        self.http_async_client = httpx.AsyncClient(
+            timeout=OPENAI_TIMEOUT,
+            transport=AsyncTimedTransport(
+                httpx.AsyncHTTPTransport(http2=OPENAI_HTTP2, limits=OPENAI_LIMITS),
+                "openai",
+            ),
+        )
+        self._models: Dict[Tuple[str, float], ChatOpenAI] = {}
+        self._runnables: Dict[str, Runnable] = {}
+
+    def model(self, name: str = DEFAULT_MODEL, temperature: float = 0) -> ChatOpenAI:
+        """Shared chat model client for `name` at `temperature`."""
+        key = (name, temperature)
+        if key not in self._models:
+            self._models[key] = ChatOpenAI(
+                model=name,
+                temperature=temperature,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+            )
+        return self._models[key]
+
+    def build_all(self):
+        """Build every registered chain up front."""
+        for name in _builders:
+            self[name]
+
+    def __getitem__(self, name: str) -> Runnable:
+        if name not in self._runnables:
+            self._runnables[name] = _builders[name](self)
+        return self._runnables[name]
+
+    async def aclose(self):
+        self.http_client.close()
+        await self.http_async_client.aclose()
+
+
+_registry: Optional[Registry] = None
+
+
+def get_registry() -> Registry:
+    """Return the process-wide registry, building it on first use."""
+    global _registry
+    if _registry is None:
+        _registry = Registry()
+        _registry.build_all()
+    return _registry
+
+
+async def close_registry():
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from .cache import cache
+from .executor import run_blocking
+from .http_client import CKAN_BASE_URL, get_http_client
+from .mirror import DATASETS, mirror_info
+
+logger = logging.getLogger(__name__)
+
+# Users within the same cell (~2 km) share cached answers
+RESPONSE_CACHE_CELL_DEGREES = float(os.getenv("RESPONSE_CACHE_CELL_DEGREES", "0.02"))
+# Shelter occupancy changes through the day; EarlyON listings rarely do
+RESPONSE_CACHE_SHELTER_TTL = int(os.getenv("RESPONSE_CACHE_SHELTER_TTL", "600"))
+RESPONSE_CACHE_FAMILY_CENTRE_TTL = int(
+    os.getenv("RESPONSE_CACHE_FAMILY_CENTRE_TTL", "86400")
+)
+DATASET_STAMP_TTL = 300
+
+_STOPWORDS = {
+    "a", "an", "the", "me", "my", "i", "im", "i'm", "please", "find", "show",
+    "looking", "look", "for", "need", "want", "can", "you", "some", "any",
+    "to", "of", "is", "are", "there", "where", "near", "nearby", "around",
+}  # fmt: skip
+
+_stamps: Dict[str, Tuple[float, str]] = {}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and filler words, and ignore word order and plurals."""
+    tokens = re.findall(r"[a-z0-9']+", (query or "").lower())
+    tokens = {re.sub(r"(\w{3,})s$", r"\1", t) for t in tokens if t not in _STOPWORDS}
+    return " ".join(sorted(tokens))
+
+
+def location_cell(users_location: Optional[Dict[str, float]]) -> str:
+    if not users_location or "lat" not in users_location:
+        return "none"
+    row = math.floor(users_location["lat"] / RESPONSE_CACHE_CELL_DEGREES)
+    col = math.floor(users_location["lng"] / RESPONSE_CACHE_CELL_DEGREES)
+    return f"{row}:{col}"
+
+
+async def _ckan_last_modified(package_id: str) -> str:
+    url = CKAN_BASE_URL + "/api/3/action/package_show"
+    package = (await get_http_client().get(url, params={"id": package_id})).json()
+    result = package["result"]
+    resources = result.get("resources") or [{}]
+    return resources[0].get("last_modified") or result.get("metadata_modified") or ""
+
+
+async def dataset_stamp(package_id: str) -> str:
+    """Last-modified stamp of a dataset, from the mirror or (briefly memoised) CKAN."""
+    now = time.monotonic()
+    memo = _stamps.get(package_id)
+    if memo and now - memo[0] < DATASET_STAMP_TTL:
+        return memo[1]
+
+    info = await run_blocking(mirror_info, package_id)
+    if info:
+        stamp = info["last_modified"] or ""
+    else:
+        try:
+            stamp = await _ckan_last_modified(package_id)
+        except Exception as e:
+            logger.warning(
+                "Could not read last-modified stamp for %s: %s", package_id, e
+            )
+            stamp = "unknown"
+
+    _stamps[package_id] = (now, stamp)
+    return stamp
+
+
+async def response_cache_key(
+    query: str, users_location: Optional[Dict[str, float]]
+) -> str:
+    stamps = [await dataset_stamp(package_id) for package_id in DATASETS]
+    raw = "|".join([normalize_query(query), location_cell(users_location), *stamps])
+    return "response:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _response_ttl(api_results: List[Dict[str, Any]], used_search: bool) -> int:
+    # Shelter records (and live Places results) go stale quickly
+    is_shelter = any(
+        "OCCUPANCY_RATE_ROOMS" in r or "LOCATION_NAME" in r for r in api_results
+    )
+    if is_shelter or used_search:
+        return RESPONSE_CACHE_SHELTER_TTL
+    return RESPONSE_CACHE_FAMILY_CENTRE_TTL
+
+
+async def get_cached_response(
+    query: str, users_location: Optional[Dict[str, float]]
+) -> Optional[Dict[str, Any]]:
+    """The cached AgentResponse dict for this query, location cell and data version."""
+    try:
+        return await cache.get(await response_cache_key(query, users_location))
+    except Exception as e:
+        logger.warning("Error reading response cache: %s", e)
+        return None
+
+
+async def store_response(state: Dict[str, Any], response: Dict[str, Any]):
+    """Cache a generated AgentResponse dict for later identical queries."""
+    try:
+        key = await response_cache_key(state.get("query"), state.get("users_location"))
+        ttl = _response_ttl(
+            state.get("api_results") or [], bool(state.get("use_search"))
+        )
+        await cache.set(key, response, expire=ttl)
+    except Exception as e:
+        logger.warning("Error writing response cache: %s", e)
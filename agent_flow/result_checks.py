@@ -0,0 +1,117 @@
+import os
+from typing import Any, Dict, List, Optional, Tuple
+from .helpers import DISTANCE_KEY
+from .mirror import DATASETS, MirroredDataset
+from .spatial_index import record_matches
+
+# Shelters above this OCCUPANCY_RATE_ROOMS (%) count as near capacity
+HIGH_OCCUPANCY_RATE = float(os.getenv("HIGH_OCCUPANCY_RATE", "85"))
+# Enough matching results within this distance settle relevance without the LLM
+EVALUATE_MIN_RESULTS = int(os.getenv("EVALUATE_MIN_RESULTS", "3"))
+EVALUATE_MAX_DISTANCE_KM = float(os.getenv("EVALUATE_MAX_DISTANCE_KM", "10"))
+
+OCCUPANCY_KEY = "OCCUPANCY_RATE_ROOMS"
+
+
+def _dataset_for(record: Dict[str, Any]) -> Optional[Tuple[str, MirroredDataset]]:
+    for package_id, dataset in DATASETS.items():
+        if dataset.address_column in record:
+            return package_id, dataset
+    return None
+
+
+def _occupancy_rate(record: Dict[str, Any]) -> Optional[float]:
+    try:
+        return float(str(record.get(OCCUPANCY_KEY)).rstrip("%"))
+    except (TypeError, ValueError):
+        return None
+
+
+def compute_high_occupancy(api_results: List[Dict[str, Any]]) -> Optional[bool]:
+    """
+    Whether most shelter results are above HIGH_OCCUPANCY_RATE.
+
+    False when there are no shelter results (the flag only applies to
+    shelters); None when shelters were found but none report a usable rate.
+    """
+    shelters = [r for r in api_results if OCCUPANCY_KEY in r or "LOCATION_NAME" in r]
+    if not shelters:
+        return False
+
+    rates = [rate for rate in map(_occupancy_rate, shelters) if rate is not None]
+    if not rates:
+        return None
+
+    high = sum(1 for rate in rates if rate > HIGH_OCCUPANCY_RATE)
+    return high > len(rates) / 2
+
+
+def check_relevance(
+    api_results: List[Dict[str, Any]],
+    applied_filters: List[Dict[str, Any]],
+    has_location: bool,
+) -> Optional[bool]:
+    """
+    Decide whether the API results answer the query without asking the LLM.
+
+    True when at least EVALUATE_MIN_RESULTS records satisfy the filters of
+    one of the calls to the tool that found them and lie within EVALUATE_MAX_DISTANCE_KM of the user;
+    False when no record satisfies them. Anything in between is None, i.e.
+    inconclusive.
+    """
+    # A tool may be called several times (e.g. SECTOR=Men, then SECTOR=Women);
+    # a record is relevant if it satisfies any one of those calls' filters
+    filters_by_package: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in applied_filters:
+        filters_by_package.setdefault(entry["package_id"], []).append(entry["filters"])
+
+    matching = []
+    for record in api_results:
+        found = _dataset_for(record)
+        if found is None:
+            return None  # a record we know nothing about; let the LLM judge
+        package_id, dataset = found
+        filter_sets = filters_by_package.get(package_id) or [{}]
+        if any(record_matches(dataset, record, filters) for filters in filter_sets):
+            matching.append(record)
+
+    if not matching:
+        return False
+
+    if has_location:
+        nearby = [
+            r
+            for r in matching
+            if r.get(DISTANCE_KEY, float("inf")) <= EVALUATE_MAX_DISTANCE_KM
+        ]
+    else:
+        nearby = matching
+
+    if len(nearby) >= EVALUATE_MIN_RESULTS:
+        return True
+    return None
+
+
+class EvaluationStats:
+    """Counts how often result evaluation was decided locally vs by the LLM."""
+
+    def __init__(self):
+        self.local = 0
+        self.escalated = 0
+
+    def record(self, escalated: bool):
+        if escalated:
+            self.escalated += 1
+        else:
+            self.local += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        total = self.local + self.escalated
+        return {
+            "local": self.local,
+            "escalated": self.escalated,
+            "skip_ratio": self.local / total if total else 0.0,
+        }
+
+
+evaluation_stats = EvaluationStats()
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+from .metrics import metrics
+
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "8"))
+MAX_QUEUED_QUERIES = int(os.getenv("MAX_QUEUED_QUERIES", "32"))
+
+# Lower runs first
+PRIORITY_CRISIS = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_LOW = 2
+
+OnPosition = Callable[[int], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+queue_depth = metrics.gauge(
+    "carebridge_queue_depth", "Queries waiting for a pipeline slot."
+)
+queue_wait = metrics.histogram(
+    "carebridge_queue_wait_seconds", "Time queries spent waiting for a slot."
+)
+admissions_total = metrics.counter(
+    "carebridge_admissions_total", "Query admission decisions.", ["decision"]
+)
+cancellations_total = metrics.counter(
+    "carebridge_cancellations_total",
+    "Queries cancelled before finishing, by reason and whether they had started.",
+    ["reason", "stage"],
+)
+reclaimed_seconds = metrics.histogram(
+    "carebridge_cancelled_after_seconds",
+    "How long cancelled pipelines had been running; everything after that "
+    "point was not spent.",
+    ["reason"],
+)
+
+
+class Job:
+    def __init__(
+        self,
+        run: Callable[[], Awaitable[None]],
+        priority: int,
+        on_position: Optional[OnPosition],
+    ):
+        self.run = run
+        self.priority = priority
+        self.on_position = on_position
+        self.queued_at = time.perf_counter()
+        self.position: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class AdmissionScheduler:
+    """
+    Bounded front door for query pipelines.
+
+    At most `max_concurrent` jobs run at once. Further jobs wait in a priority
+    queue (lower priority value first, FIFO within a priority) of at most
+    `max_queued` entries; beyond that `submit` refuses them so the caller can
+    answer "busy" straight away. Queued jobs are told their position whenever
+    it changes.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_QUERIES,
+        max_queued: int = MAX_QUEUED_QUERIES,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._queue: List[Tuple[int, int, Job]] = []
+        self._order = itertools.count()
+        self._running: Set[asyncio.Task] = set()
+        self._notifier: Optional[asyncio.Task] = None
+        self._positions_changed = False
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def submit(
+        self,
+        run: Callable[[], Awaitable[None]],
+        priority: int = PRIORITY_DEFAULT,
+        on_position: Optional[OnPosition] = None,
+    ) -> Optional[Job]:
+        """Start or queue `run`; returns None if the queue is full."""
+        job = Job(run, priority, on_position)
+
+        if self.running < self.max_concurrent and not self._queue:
+            admissions_total.inc("started")
+            self._start(job)
+            return job
+
+        if len(self._queue) >= self.max_queued:
+            admissions_total.inc("rejected")
+            return None
+
+        admissions_total.inc("queued")
+        heapq.heappush(self._queue, (priority, next(self._order), job))
+        queue_depth.inc()
+        self._notify_positions()
+        return job
+
+    def cancel(self, job: Job, reason: str) -> Optional[str]:
+        """
+        Withdraw a queued job or cancel a running one.
+
+        Cancelling the task interrupts whatever the pipeline is awaiting (LLM
+        and HTTP requests included). Returns the stage the job was in
+        ("queued" or "running"), or None if it had already finished.
+        """
+        if job.task is None:
+            for index, (_, _, queued) in enumerate(self._queue):
+                if queued is job:
+                    self._queue.pop(index)
+                    heapq.heapify(self._queue)
+                    queue_depth.dec()
+                    self._notify_positions()
+                    cancellations_total.inc(reason, "queued")
+                    return "queued"
+            return None
+
+        if job.task.done():
+            return None
+
+        job.task.cancel()
+        cancellations_total.inc(reason, "running")
+        reclaimed_seconds.observe(time.perf_counter() - job.started_at, reason)
+        return "running"
+
+    def _start(self, job: Job):
+        job.started_at = time.perf_counter()
+        queue_wait.observe(job.started_at - job.queued_at)
+        job.task = asyncio.create_task(job.run())
+        self._running.add(job.task)
+        job.task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if task.cancelled():
+            logger.debug("Query pipeline cancelled")
+        elif task.exception() is not None:
+            logger.error("Query pipeline failed", exc_info=task.exception())
+
+        started = False
+        while self._queue and self.running < self.max_concurrent:
+            _, _, job = heapq.heappop(self._queue)
+            queue_depth.dec()
+            self._start(job)
+            started = True
+        if started:
+            self._notify_positions()
+
+    def _notify_positions(self):
+        self._positions_changed = True
+        if self._notifier is None or self._notifier.done():
+            self._notifier = asyncio.create_task(self._send_positions())
+
+    async def _send_positions(self):
+        while self._positions_changed:
+            self._positions_changed = False
+            # Let a burst of queue changes settle into one round of updates
+            await asyncio.sleep(0)
+            for position, (_, _, job) in enumerate(sorted(self._queue), start=1):
+                if job.on_position is None or job.position == position:
+                    continue
+                job.position = position
+                try:
+                    await job.on_position(position)
+                except Exception as e:
+                    logger.warning("Error sending queue position: %s", e)
@@ -0,0 +1,412 @@
+import asyncio
+import heapq
+import logging
+import math
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from .distance import haversine_distance
+from .executor import run_blocking
+from .helpers import (
+    DISTANCE_KEY,
+    aapi_search,
+    clean_filters,
+    filter_results_by_proximity,
+    geocode_addresses,
+    prune_results,
+    with_distance,
+)
+from .mirror import (
+    DATASETS,
+    MirroredDataset,
+    connect_mirror,
+    current_records,
+    is_fresh,
+    mirror_version,
+)
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size in degrees (~1.1 km north-south, ~0.8 km east-west in Toronto)
+CELL_SIZE_DEGREES = 0.01
+KM_PER_DEGREE = 111.195
+
+Cell = Tuple[int, int]
+
+
+def _cell_for(lat: float, lng: float) -> Cell:
+    return math.floor(lat / CELL_SIZE_DEGREES), math.floor(lng / CELL_SIZE_DEGREES)
+
+
+def record_matches(
+    dataset: MirroredDataset, record: Dict[str, Any], filters: Dict[str, Any]
+) -> bool:
+    """Apply the same predicates as the CKAN/mirror search to a single record."""
+    for key, value in filters.items():
+        if key == dataset.language_column:
+            record_languages = str(record.get(key) or "").lower()
+            wanted = [lang.strip().lower() for lang in value.split(";") if lang.strip()]
+            if not any(lang in record_languages for lang in wanted):
+                return False
+        elif str(record.get(key)) != str(value):
+            return False
+    return True
+
+
+class SpatialIndex:
+    """
+    Uniform lat/lng grid over the geocoded records of one dataset.
+
+    k-nearest queries walk outwards ring by ring from the user's cell and stop
+    as soon as no unvisited ring can hold anything closer than the current
+    k-th match, so the cost depends on local density rather than dataset size.
+    """
+
+    def __init__(
+        self,
+        dataset: MirroredDataset,
+        version: str,
+        located: List[Tuple[float, float, Dict[str, Any]]],
+        unlocated: List[Dict[str, Any]],
+    ):
+        self.dataset = dataset
+        self.version = version
+        self.unlocated = unlocated
+        self.size = len(located) + len(unlocated)
+        self.cells: Dict[Cell, List[Tuple[float, float, Dict[str, Any]]]] = {}
+
+        for lat, lng, record in located:
+            self.cells.setdefault(_cell_for(lat, lng), []).append((lat, lng, record))
+
+        if self.cells:
+            rows = [cell[0] for cell in self.cells]
+            cols = [cell[1] for cell in self.cells]
+            self.bounds = (min(rows), max(rows), min(cols), max(cols))
+            max_abs_lat = max(abs(lat) for lat, _, _ in located)
+            # Narrowest cell side, so ring distances are never overestimated
+            self.min_cell_km = (
+                CELL_SIZE_DEGREES * KM_PER_DEGREE * math.cos(math.radians(max_abs_lat))
+            )
+        else:
+            self.bounds = None
+            self.min_cell_km = 0.0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _ring(self, center: Cell, radius: int):
+        row, col = center
+        if radius == 0:
+            yield center
+            return
+        for d in range(-radius, radius + 1):
+            yield row - radius, col + d
+            yield row + radius, col + d
+        for d in range(-radius + 1, radius):
+            yield row + d, col - radius
+            yield row + d, col + radius
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int,
+        filters: Dict[str, Any],
+        max_radius_km: Optional[float] = None,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Return up to k (distance_km, record) pairs matching `filters`, closest first.
+
+        With `max_radius_km`, matches further away are dropped and the ring walk
+        stops once it passes the radius.
+        """
+        best: List[Tuple[float, int, Dict[str, Any]]] = []  # max-heap on -distance
+
+        if self.bounds:
+            center = _cell_for(lat, lng)
+            min_row, max_row, min_col, max_col = self.bounds
+            max_radius = max(
+                abs(center[0] - min_row),
+                abs(center[0] - max_row),
+                abs(center[1] - min_col),
+                abs(center[1] - max_col),
+            )
+
+            for radius in range(max_radius + 1):
+                if (
+                    max_radius_km is not None
+                    and (radius - 1) * self.min_cell_km > max_radius_km
+                ):
+                    break
+                for cell in self._ring(center, radius):
+                    for entry_lat, entry_lng, record in self.cells.get(cell, ()):
+                        if not record_matches(self.dataset, record, filters):
+                            continue
+                        dist = haversine_distance(lat, lng, entry_lat, entry_lng)
+                        if max_radius_km is not None and dist > max_radius_km:
+                            continue
+                        item = (-dist, id(record), record)
+                        if len(best) < k:
+                            heapq.heappush(best, item)
+                        elif dist < -best[0][0]:
+                            heapq.heapreplace(best, item)
+
+                # Anything in ring radius+1 is at least radius full cells away
+                if len(best) >= k and -best[0][0] <= radius * self.min_cell_km:
+                    break
+
+        results = sorted(
+            ((-neg, record) for neg, _, record in best), key=lambda x: x[0]
+        )
+
+        # Like the geocode-then-sort path, records without coordinates go last
+        for record in self.unlocated:
+            if len(results) >= k or max_radius_km is not None:
+                break
+            if record_matches(self.dataset, record, filters):
+                results.append((float("inf"), record))
+
+        return results
+
+
+_indexes: Dict[str, SpatialIndex] = {}
+
+
+def _ensure_schema(conn, dataset: MirroredDataset):
+    conn.execute("""CREATE TABLE IF NOT EXISTS geo_addresses (
+            address TEXT PRIMARY KEY,
+            lat REAL,
+            lng REAL
+        )""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS spatial_meta (
+            package_id TEXT PRIMARY KEY,
+            version TEXT NOT NULL,
+            built_at REAL NOT NULL
+        )""")
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{dataset.table}_geo" '
+        "(_id INTEGER PRIMARY KEY, lat REAL NOT NULL, lng REAL NOT NULL, "
+        "cell_row INTEGER NOT NULL, cell_col INTEGER NOT NULL)"
+    )
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS "idx_{dataset.table}_geo_cell" '
+        f'ON "{dataset.table}_geo" (cell_row, cell_col)'
+    )
+
+
+def _built_version(package_id: str) -> Optional[str]:
+    with connect_mirror() as conn:
+        try:
+            row = conn.execute(
+                "SELECT version FROM spatial_meta WHERE package_id = ?", (package_id,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+    return row["version"] if row else None
+
+
+def _known_addresses(
+    dataset: MirroredDataset, addresses: List[str], include_unresolved: bool = True
+) -> Dict[str, Optional[dict]]:
+    """
+    Stored coordinates per address; None for addresses Google had no result
+    for, unless `include_unresolved` is False.
+    """
+    known = {}
+    with connect_mirror() as conn:
+        _ensure_schema(conn, dataset)
+        for address in addresses:
+            row = conn.execute(
+                "SELECT lat, lng FROM geo_addresses WHERE address = ?", (address,)
+            ).fetchone()
+            if row and row["lat"] is not None:
+                known[address] = {"lat": row["lat"], "lng": row["lng"]}
+            elif row and include_unresolved:
+                known[address] = None
+    return known
+
+
+def _store_index(
+    package_id: str,
+    dataset: MirroredDataset,
+    version: str,
+    records: List[Dict[str, Any]],
+    coords_by_address: Dict[str, Optional[dict]],
+    new_addresses: Dict[str, Optional[dict]],
+):
+    with connect_mirror() as conn:
+        _ensure_schema(conn, dataset)
+        conn.executemany(
+            "INSERT OR REPLACE INTO geo_addresses (address, lat, lng) VALUES (?, ?, ?)",
+            [
+                (
+                    address,
+                    coords["lat"] if coords else None,
+                    coords["lng"] if coords else None,
+                )
+                for address, coords in new_addresses.items()
+            ],
+        )
+        conn.execute(f'DELETE FROM "{dataset.table}_geo"')
+        rows = []
+        for record in records:
+            coords = coords_by_address.get(record.get(dataset.address_column) or "")
+            if coords:
+                rows.append(
+                    (
+                        record["_id"],
+                        coords["lat"],
+                        coords["lng"],
+                        *_cell_for(coords["lat"], coords["lng"]),
+                    )
+                )
+        conn.executemany(
+            f'INSERT INTO "{dataset.table}_geo" (_id, lat, lng, cell_row, cell_col) '
+            "VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO spatial_meta (package_id, version, built_at) VALUES (?, ?, ?)",
+            (package_id, version, time.time()),
+        )
+
+
+async def build_spatial_index(package_id: str, force: bool = False):
+    """
+    Geocode the mirrored records of a dataset and persist their grid cells.
+
+    Runs after each mirror refresh and is a no-op when the index already
+    matches the mirrored data and every address has been resolved.
+    Coordinates are remembered per address, so only addresses never seen
+    before (or whose lookup failed last time) reach the geocoder. `force`
+    also retries addresses Google had no result for.
+    """
+    dataset = DATASETS[package_id]
+    version = mirror_version(package_id)
+    if version is None:
+        return
+
+    records = await asyncio.to_thread(current_records, package_id)
+    addresses = list(
+        dict.fromkeys(
+            r.get(dataset.address_column)
+            for r in records
+            if r.get(dataset.address_column)
+        )
+    )
+
+    coords_by_address = await asyncio.to_thread(
+        _known_addresses, dataset, addresses, not force
+    )
+    unknown = [address for address in addresses if address not in coords_by_address]
+    if (
+        not force
+        and not unknown
+        and await asyncio.to_thread(_built_version, package_id) == version
+    ):
+        return
+
+    # Failed lookups are missing from the result and stay unknown, so the
+    # next refresh retries them
+    new_addresses = await geocode_addresses(unknown)
+    coords_by_address.update(new_addresses)
+
+    await asyncio.to_thread(
+        _store_index,
+        package_id,
+        dataset,
+        version,
+        records,
+        coords_by_address,
+        new_addresses,
+    )
+    _indexes.pop(package_id, None)
+    logger.info(
+        "Spatial index: built %s with %d records (%d newly geocoded addresses, "
+        "%d lookups failed).",
+        package_id,
+        len(records),
+        len(new_addresses),
+        len(unknown) - len(new_addresses),
+    )
+
+
+def _load_index(package_id: str, version: str) -> SpatialIndex:
+    dataset = DATASETS[package_id]
+    records = current_records(package_id)
+    with connect_mirror() as conn:
+        coords = {
+            row["_id"]: (row["lat"], row["lng"])
+            for row in conn.execute(f'SELECT _id, lat, lng FROM "{dataset.table}_geo"')
+        }
+
+    located, unlocated = [], []
+    for record in records:
+        if record["_id"] in coords:
+            lat, lng = coords[record["_id"]]
+            located.append((lat, lng, record))
+        else:
+            unlocated.append(record)
+    return SpatialIndex(dataset, version, located, unlocated)
+
+
+def get_spatial_index(package_id: str) -> Optional[SpatialIndex]:
+    """Return the index for a dataset if it is built for the current, fresh mirror."""
+    if package_id not in DATASETS or not is_fresh(package_id):
+        return None
+
+    version = mirror_version(package_id)
+    if _built_version(package_id) != version:
+        return None
+
+    index = _indexes.get(package_id)
+    if index is None or index.version != version:
+        index = _load_index(package_id, version)
+        _indexes[package_id] = index
+    return index
+
+
+async def find_nearest_resources(
+    package_id: str,
+    filters,
+    user_coords: Dict[str, float],
+    address_field: str,
+    essential_keys: List[str],
+    limit: int = 6,
+    max_radius_km: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Return the `limit` matching resources closest to the user, pruned to `essential_keys`.
+
+    Uses the precomputed spatial index when one is available for the current
+    mirror; otherwise searches CKAN and ranks the results by geocoding them.
+    """
+    filters_clean = clean_filters(filters)
+
+    if user_coords:
+        index = await run_blocking(get_spatial_index, package_id)
+        if index is not None:
+            nearest = index.nearest(
+                user_coords["lat"],
+                user_coords["lng"],
+                limit,
+                filters_clean,
+                max_radius_km,
+            )
+            logger.debug(
+                "Spatial index returned %d of %d records", len(nearest), len(index)
+            )
+            return prune_results(
+                [with_distance(record, dist) for dist, record in nearest],
+                essential_keys + [DISTANCE_KEY],
+            )
+
+    response = await aapi_search(package_id, filters_clean)
+    return await filter_results_by_proximity(
+        results=response,
+        user_coords=user_coords,
+        address_field=address_field,
+        essential_keys=essential_keys,
+        limit=limit,
+        max_radius_km=max_radius_km,
+    )
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: run likely-next nodes alongside their predecessors
+SPECULATIVE_EXECUTION = os.getenv("SPECULATIVE_EXECUTION", "").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+Node = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+Router = Callable[[Dict[str, Any]], str]
+
+
+class SpeculationStats:
+    """Per-branch counts of speculative runs that were kept or thrown away."""
+
+    def __init__(self):
+        self.branches: Dict[str, Dict[str, float]] = {}
+
+    def _branch(self, name: str) -> Dict[str, float]:
+        return self.branches.setdefault(
+            name, {"hits": 0, "misses": 0, "saved_seconds": 0.0, "wasted_seconds": 0.0}
+        )
+
+    def record_hit(self, name: str, saved_seconds: float):
+        branch = self._branch(name)
+        branch["hits"] += 1
+        branch["saved_seconds"] += saved_seconds
+
+    def record_miss(self, name: str, wasted_seconds: float):
+        branch = self._branch(name)
+        branch["misses"] += 1
+        branch["wasted_seconds"] += wasted_seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        snapshot = {}
+        for name, branch in self.branches.items():
+            total = branch["hits"] + branch["misses"]
+            snapshot[name] = {
+                **branch,
+                "hit_rate": branch["hits"] / total if total else 0.0,
+            }
+        return snapshot
+
+
+speculation_stats = SpeculationStats()
+
+
+def _merge_updates(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two node updates; list values (e.g. messages) are concatenated."""
+    merged = dict(second)
+    for key, value in first.items():
+        if isinstance(value, list) and isinstance(merged.get(key), list):
+            merged[key] = value + merged[key]
+        else:
+            merged[key] = value
+    return merged
+
+
+def speculate(
+    name: str, node: Node, route: Router, expected: str, speculative: Node
+) -> Node:
+    """
+    Run `node` and, concurrently, the node `route` usually picks after it.
+
+    When `route` agrees with `expected` on the state after `node`, the
+    speculative update is committed together with `node`'s; otherwise the
+    speculative run is cancelled and only `node`'s update is returned. The
+    speculative node only sees the state from before `node` ran, so it must
+    not depend on `node`'s output.
+    """
+
+    async def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        speculative_done = {}
+
+        async def run_speculative():
+            try:
+                return await speculative(state)
+            finally:
+                speculative_done["at"] = time.perf_counter()
+
+        task = asyncio.create_task(run_speculative())
+
+        try:
+            update = await node(state)
+        except BaseException:
+            task.cancel()
+            raise
+        decided = time.perf_counter()
+
+        if route({**state, **update}) != expected:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.debug("Discarded speculative %s failed: %s", name, e)
+            speculation_stats.record_miss(
+                name, speculative_done.get("at", decided) - started
+            )
+            logger.debug("Speculation miss (%s): discarded speculative work", name)
+            return update
+
+        speculative_update = await task
+        # Time saved is the part of the speculative run that overlapped `node`
+        speculation_stats.record_hit(
+            name, min(decided, speculative_done["at"]) - started
+        )
+        logger.debug("Speculation hit (%s)", name)
+        return _merge_updates(update, speculative_update)
+
+    return run
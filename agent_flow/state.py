@@ -12,6 +12,8 @@ class GraphState(AgentState):
         context: User's selected options for more context
         use_search: whether to add search
         api_results: results from API calls
+        applied_filters: dataset filters the API tools searched with
+        is_high_occupancy: whether most shelter results are near capacity
         search_results: results from search
     """
 
@@ -20,6 +22,8 @@ class GraphState(AgentState):
     is_valid_query: str
     use_search: bool
     api_results: Annotated[List, operator.add]
+    applied_filters: Annotated[List, operator.add]
+    is_high_occupancy: bool
     search_results: List[str]
     structured_response: dict[str, str | list] | None = None
     error_response: str | None = None
@@ -1,19 +1,25 @@
+import logging
 from typing import Annotated, Any, Dict
 from langchain_core.tools import tool
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain_openai import ChatOpenAI
 from agent_flow.models.filters import ChildrenFamilyCenterFilter
+from agent_flow.registry import Registry, get_registry, register
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.messages import ToolMessage
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
-from agent_flow.helpers import (
-    api_search,
-    filter_results_by_proximity,
+from agent_flow.helpers import clean_filters
+from agent_flow.spatial_index import find_nearest_resources
+from agent_flow.tools.language_extraction import (
+    SUPPORTED_LANGUAGES,
+    extract_family_center_filter,
 )
 from utils.socket_context import SocketIOContext
 
+logger = logging.getLogger(__name__)
+
+FAMILY_CENTER_PACKAGE_ID = "earlyon-child-and-family-centres"
 
 EVALUATOR_ESSENTIAL_FAMILY_CENTER_KEYS = [
     "program_name",
@@ -28,49 +34,9 @@ EVALUATOR_ESSENTIAL_FAMILY_CENTER_KEYS = [
     "indigenous_program",
 ]
 
-SUPPORTED_LANGUAGES = [
-    "Akan (Twi)",
-    "Arabic",
-    "Bengali",
-    "Cantonese",
-    "Chinese - Other",
-    "Dari",
-    "Edo",
-    "French",
-    "German",
-    "Gujarati",
-    "Hindi",
-    "Italian",
-    "Japanese",
-    "Korean",
-    "Mandarin",
-    "Panjabi (Punjabi)",
-    "Pashto",
-    "Persian (Farsi)",
-    "Portuguese",
-    "Russian",
-    "Somali",
-    "Spanish",
-    "Tagalog (Pilipino, Filipino)",
-    "Tamil",
-    "Urdu",
-    "Vietnamese",
-]
-
-
-@tool
-def retrieve_children_family_centers(
-    user_query: str,
-    tool_call_id: Annotated[str, InjectedToolCallId],
-    state: Annotated[dict, InjectedState],
-):
-    """Use this tool to retrieve children centers or family centers based on user query."""
-    # await SocketIOContext.emit("update", {"message": "Searching"})
-    print("USED CHILDREN AND FAMILY CENTERS TOOL...")
-    # user_query = "I'm looking for children and family centers for indegenous people in Toronto."
-
-    model = ChatOpenAI(model="gpt-4o", temperature=0)
 
+@register("family_center_filter")
+def build_family_center_filter_chain(registry: Registry):
     parser = PydanticOutputParser(pydantic_object=ChildrenFamilyCenterFilter)
 
     prompt = PromptTemplate(
@@ -102,19 +68,34 @@ def retrieve_children_family_centers(
         },
     )
 
-    llm_with_parser = prompt | model | parser
+    return prompt | registry.model() | parser
+
+
+@tool
+async def retrieve_children_family_centers(
+    user_query: str,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    state: Annotated[dict, InjectedState],
+):
+    """Use this tool to retrieve children centers or family centers based on user query."""
+    # await SocketIOContext.emit("update", {"message": "Searching"})
+    # user_query = "I'm looking for children and family centers for indegenous people in Toronto."
 
-    print("User query:", user_query)
+    logger.debug("Tool query: %s", user_query)
 
-    output = llm_with_parser.invoke({"query": user_query})
+    # Resolve languages and programs locally; only ambiguous text needs the LLM
+    output = extract_family_center_filter(user_query)
 
-    print("OUTPUT:", output)
+    if output is None:
+        llm_with_parser = get_registry()["family_center_filter"]
+        output = await llm_with_parser.ainvoke({"query": user_query})
 
-    response = api_search("earlyon-child-and-family-centres", output)
+    logger.debug("Extracted filters: %s", output)
 
     user_coords = state.get("users_location", {})
-    final_results = filter_results_by_proximity(
-        results=response,
+    final_results = await find_nearest_resources(
+        package_id=FAMILY_CENTER_PACKAGE_ID,
+        filters=output,
         user_coords=user_coords,
         address_field="full_address",
         essential_keys=EVALUATOR_ESSENTIAL_FAMILY_CENTER_KEYS,
@@ -124,6 +105,12 @@ def retrieve_children_family_centers(
     return Command(
         update={
             "api_results": final_results,
+            "applied_filters": [
+                {
+                    "package_id": FAMILY_CENTER_PACKAGE_ID,
+                    "filters": clean_filters(output),
+                }
+            ],
             "messages": [
                 ToolMessage(
                     "Successfully looked up children and family centers",
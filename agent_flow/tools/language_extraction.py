@@ -0,0 +1,150 @@
+import re
+from typing import Dict, List, Optional
+from agent_flow.models.filters import ChildrenFamilyCenterFilter
+
+SUPPORTED_LANGUAGES = [
+    "Akan (Twi)",
+    "Arabic",
+    "Bengali",
+    "Cantonese",
+    "Chinese - Other",
+    "Dari",
+    "Edo",
+    "French",
+    "German",
+    "Gujarati",
+    "Hindi",
+    "Italian",
+    "Japanese",
+    "Korean",
+    "Mandarin",
+    "Panjabi (Punjabi)",
+    "Pashto",
+    "Persian (Farsi)",
+    "Portuguese",
+    "Russian",
+    "Somali",
+    "Spanish",
+    "Tagalog (Pilipino, Filipino)",
+    "Tamil",
+    "Urdu",
+    "Vietnamese",
+]
+
+# Lowercase names users write, mapped to the dataset's language names
+LANGUAGE_ALIASES: Dict[str, str] = {
+    "akan": "Akan (Twi)",
+    "twi": "Akan (Twi)",
+    "arabic": "Arabic",
+    "bengali": "Bengali",
+    "bangla": "Bengali",
+    "cantonese": "Cantonese",
+    "dari": "Dari",
+    "edo": "Edo",
+    "bini": "Edo",
+    "german": "German",
+    "gujarati": "Gujarati",
+    "hindi": "Hindi",
+    "italian": "Italian",
+    "japanese": "Japanese",
+    "korean": "Korean",
+    "mandarin": "Mandarin",
+    "putonghua": "Mandarin",
+    "panjabi": "Panjabi (Punjabi)",
+    "punjabi": "Panjabi (Punjabi)",
+    "pashto": "Pashto",
+    "pashtu": "Pashto",
+    "pushto": "Pashto",
+    "persian": "Persian (Farsi)",
+    "farsi": "Persian (Farsi)",
+    "portuguese": "Portuguese",
+    "russian": "Russian",
+    "somali": "Somali",
+    "spanish": "Spanish",
+    "tagalog": "Tagalog (Pilipino, Filipino)",
+    "filipino": "Tagalog (Pilipino, Filipino)",
+    "pilipino": "Tagalog (Pilipino, Filipino)",
+    "tamil": "Tamil",
+    "urdu": "Urdu",
+    "vietnamese": "Vietnamese",
+    # French as a spoken language (as opposed to a French program)
+    "in french": "French",
+    "speaks french": "French",
+    "speak french": "French",
+    "french speaking": "French",
+    "french-speaking": "French",
+    "french speakers": "French",
+}
+
+FRENCH_PROGRAM_TRIGGERS = [
+    "french language program",
+    "french-language program",
+    "french program",
+    "french programming",
+    "french programs",
+    "french language programs",
+    "french-language programs",
+    "francophone",
+    "en français",
+    "en francais",
+    "french immersion",
+]
+
+INDIGENOUS_PROGRAM_TRIGGERS = [
+    "indigenous",
+    "first nation",
+    "first nations",
+    "métis",
+    "metis",
+    "inuit",
+    "aboriginal",
+]
+
+# Mentions that a fixed table cannot resolve; the LLM decides these
+AMBIGUOUS_TERMS = [
+    "chinese",  # Cantonese, Mandarin or "Chinese - Other"?
+    "french",  # a French program or French-speaking staff?
+    "native",  # Indigenous program or native language?
+]
+
+_ACTIONS: Dict[str, tuple] = {}
+for _alias, _language in LANGUAGE_ALIASES.items():
+    _ACTIONS[_alias] = ("language", _language)
+for _trigger in FRENCH_PROGRAM_TRIGGERS:
+    _ACTIONS[_trigger] = ("french_language_program", "Yes")
+for _trigger in INDIGENOUS_PROGRAM_TRIGGERS:
+    _ACTIONS[_trigger] = ("indigenous_program", "Yes")
+for _term in AMBIGUOUS_TERMS:
+    _ACTIONS[_term] = ("ambiguous", _term)
+
+# One alternation over every alias and trigger. Longest first, so
+# "french program" wins over "french" and "first nations" over "first nation".
+_MATCHER = re.compile(
+    r"(?<![\w-])("
+    + "|".join(re.escape(term) for term in sorted(_ACTIONS, key=len, reverse=True))
+    + r")(?!\w)"
+)
+
+
+def extract_family_center_filter(query: str) -> Optional[ChildrenFamilyCenterFilter]:
+    """
+    Build the EarlyON filter from the query without calling the LLM.
+
+    Returns None when the query mentions something the tables cannot resolve
+    on their own (e.g. plain "Chinese" or "French"), so the caller can fall
+    back to the LLM extraction.
+    """
+    languages: List[str] = []
+    fields = {"french_language_program": "", "indigenous_program": ""}
+
+    for match in _MATCHER.finditer((query or "").lower()):
+        kind, value = _ACTIONS[match.group(1)]
+        if kind == "ambiguous":
+            return None
+        if kind == "language":
+            if value not in languages:
+                languages.append(value)
+        else:
+            fields[kind] = value
+
+    return ChildrenFamilyCenterFilter(languages="; ".join(languages), **fields)
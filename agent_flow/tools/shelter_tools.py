@@ -1,16 +1,21 @@
+import logging
 from typing import Annotated, Any, Dict
 from langchain_core.tools import tool
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
-from langchain_openai import ChatOpenAI
 from agent_flow.models.filters import ShelterFilter
+from agent_flow.registry import Registry, get_registry, register
 from langchain_core.tools.base import InjectedToolCallId
 from langchain_core.messages import ToolMessage
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
-from agent_flow.helpers import api_search, filter_results_by_proximity
+from agent_flow.helpers import clean_filters
+from agent_flow.spatial_index import find_nearest_resources
 from utils.socket_context import SocketIOContext
 
+logger = logging.getLogger(__name__)
+
+SHELTER_PACKAGE_ID = "daily-shelter-overnight-service-occupancy-capacity"
 
 EVALUATOR_ESSENTIAL_SHELTER_KEYS = [
     "LOCATION_NAME",
@@ -23,19 +28,8 @@ EVALUATOR_ESSENTIAL_SHELTER_KEYS = [
 ]
 
 
-@tool
-def retrieve_shelters(
-    user_query: str,
-    tool_call_id: Annotated[str, InjectedToolCallId],
-    state: Annotated[dict, InjectedState],
-) -> Dict[str, Any]:
-    """Use this tool to retrieve shelters based on user query."""
-    # await SocketIOContext.emit("update", {"message": "Searching"})
-
-    print("USED SHELTERS TOOL...")
-
-    model = ChatOpenAI(model="gpt-4o", temperature=0)
-
+@register("shelter_filter")
+def build_shelter_filter_chain(registry: Registry):
     parser = PydanticOutputParser(pydantic_object=ShelterFilter)
 
     prompt = PromptTemplate(
@@ -51,19 +45,30 @@ def retrieve_shelters(
         partial_variables={"format_instructions": parser.get_format_instructions()},
     )
 
-    llm_with_parser = prompt | model | parser
+    return prompt | registry.model() | parser
 
-    print("User query:", user_query)
 
-    output = llm_with_parser.invoke({"query": user_query})
+@tool
+async def retrieve_shelters(
+    user_query: str,
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    state: Annotated[dict, InjectedState],
+) -> Dict[str, Any]:
+    """Use this tool to retrieve shelters based on user query."""
+    # await SocketIOContext.emit("update", {"message": "Searching"})
+
+    llm_with_parser = get_registry()["shelter_filter"]
 
-    print("OUTPUT:", output)
+    logger.debug("Tool query: %s", user_query)
 
-    response = api_search("daily-shelter-overnight-service-occupancy-capacity", output)
+    output = await llm_with_parser.ainvoke({"query": user_query})
+
+    logger.debug("Extracted filters: %s", output)
 
     user_coords = state.get("users_location", {})
-    final_results = filter_results_by_proximity(
-        results=response,
+    final_results = await find_nearest_resources(
+        package_id=SHELTER_PACKAGE_ID,
+        filters=output,
         user_coords=user_coords,
         address_field="LOCATION_ADDRESS",
         essential_keys=EVALUATOR_ESSENTIAL_SHELTER_KEYS,
@@ -73,6 +78,9 @@ def retrieve_shelters(
     return Command(
         update={
             "api_results": final_results,
+            "applied_filters": [
+                {"package_id": SHELTER_PACKAGE_ID, "filters": clean_filters(output)}
+            ],
             "messages": [
                 ToolMessage(
                     "Successfully looked up shelters from Toronto Open Data",
@@ -0,0 +1,189 @@
+"""
+Graph worker: pulls queries queued by the web process (GRAPH_QUEUE_MODE=1)
+from Redis, runs them through the graph and emits the results to the client
+through the Socket.IO Redis channel.
+
+    python -m agent_flow.worker
+
+Run as many as needed; each takes up to WORKER_CONCURRENCY jobs at a time.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from utils.socket_context import create_client_manager
+from .cache import redis_cache
+from .executor import run_blocking, shutdown_executor
+from .http_client import close_http_client
+from .job_queue import JOB_CANCEL_CHANNEL, cancellation_reason, next_job
+from .log import configure_logging
+from .metrics import metrics
+from .mirror import MIRROR_SYNC_INTERVAL_SECONDS, run_periodic_sync
+from .pipeline import answer_query
+from .prompt_format import load_token_encoder
+from .registry import close_registry, get_registry
+from .scheduler import (
+    MAX_CONCURRENT_QUERIES,
+    cancellations_total,
+    queue_wait,
+    reclaimed_seconds,
+)
+from .spatial_index import build_spatial_index
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", str(MAX_CONCURRENT_QUERIES)))
+# Serve /metrics for this worker on this port; 0 disables it
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int):
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Worker metrics on :%d/metrics", port)
+
+
+class GraphWorker:
+    """Runs queued jobs, at most `concurrency` at once, and honours cancellations."""
+
+    def __init__(self, concurrency: int = WORKER_CONCURRENCY):
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        # job id -> (task, started_at)
+        self._running: Dict[str, Tuple[asyncio.Task, float]] = {}
+
+    async def run(self):
+        manager = create_client_manager(write_only=True)
+        if manager is None:
+            sys.exit("The graph worker needs Redis; set REDIS_HOST and REDIS_PORT.")
+
+        listener = asyncio.create_task(self._listen_for_cancellations())
+        logger.info("Graph worker started, running up to %d jobs", self.concurrency)
+        try:
+            while True:
+                await self._slots.acquire()
+                job = await self._next_job()
+                if job is None:
+                    self._slots.release()
+                    continue
+                self._start(job, manager)
+        finally:
+            listener.cancel()
+            for task, _ in list(self._running.values()):
+                task.cancel()
+
+    async def _next_job(self) -> Optional[dict]:
+        try:
+            job = await next_job()
+            reason = job and await cancellation_reason(job["id"])
+        except Exception as e:
+            logger.warning("Error reading the job queue: %s", e)
+            await asyncio.sleep(1)
+            return None
+        if job is None:
+            return None
+
+        if reason:
+            logger.info("Skipping cancelled job %s (%s)", job["id"], reason)
+            cancellations_total.inc(reason, "queued")
+            return None
+
+        queue_wait.observe(max(0.0, time.time() - job["enqueued_at"]))
+        return job
+
+    def _start(self, job: dict, manager):
+        task = asyncio.create_task(
+            answer_query(
+                manager,
+                job["sid"],
+                job["query"],
+                job["users_location"],
+                request_id=job["id"],
+            )
+        )
+        self._running[job["id"]] = (task, time.perf_counter())
+
+        def finished(task: asyncio.Task):
+            self._running.pop(job["id"], None)
+            self._slots.release()
+            if task.cancelled():
+                logger.info("Job %s cancelled", job["id"])
+
+        task.add_done_callback(finished)
+
+    async def _listen_for_cancellations(self):
+        while True:
+            try:
+                async with redis_cache.client.pubsub() as pubsub:
+                    await pubsub.subscribe(JOB_CANCEL_CHANNEL)
+                    while True:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is not None:
+                            self._cancel(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    "Error listening for cancellations, resubscribing: %s", e
+                )
+                await asyncio.sleep(1)
+
+    def _cancel(self, message: dict):
+        running = self._running.get(message["id"])
+        if running is None:
+            return
+        task, started_at = running
+        task.cancel()
+        cancellations_total.inc(message["reason"], "running")
+        reclaimed_seconds.observe(time.perf_counter() - started_at, message["reason"])
+
+
+async def main():
+    configure_logging()
+    get_registry()
+    await run_blocking(load_token_encoder)
+    if not await redis_cache.connect():
+        sys.exit("The graph worker needs Redis; set REDIS_HOST and REDIS_PORT.")
+    if WORKER_METRICS_PORT:
+        serve_metrics(WORKER_METRICS_PORT)
+
+    mirror_task = None
+    if MIRROR_SYNC_INTERVAL_SECONDS > 0:
+        mirror_task = asyncio.create_task(
+            run_periodic_sync(on_synced=build_spatial_index)
+        )
+
+    try:
+        await GraphWorker().run()
+    finally:
+        if mirror_task:
+            mirror_task.cancel()
+        await close_http_client()
+        await close_registry()
+        await redis_cache.close()
+        shutdown_executor()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
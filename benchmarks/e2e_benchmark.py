@@ -0,0 +1,248 @@
+"""
+End-to-end latency and throughput of the compiled graph, fully offline.
+
+The graph runs unchanged against local stand-ins (see benchmarks/fakes.py):
+a fake chat model with configurable latency, a stub CKAN server over
+synthetic datasets, stubbed Google geocode/Places and the in-process cache
+tier (or a real Redis with --redis and the usual REDIS_* settings).
+
+    python -m benchmarks.e2e_benchmark [--requests 200] [--concurrency 16]
+        [--llm-latency 0.5] [--token-latency 0.01] [--ckan-latency 0.05]
+        [--google-latency 0.05] [--mirror] [--speculative] [--redis]
+        [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.fakes import (
+    FAMILY_CENTRE_PACKAGE_ID,
+    SHELTER_PACKAGE_ID,
+    FakeChatModel,
+    StubCkanServer,
+    StubGoogleMaps,
+    family_centre_records,
+    seeded_location,
+    shelter_records,
+)
+
+QUERIES = [
+    "Shelter for men tonight",
+    "I need a bed at a women's shelter",
+    "Youth shelter near me",
+    "Homeless shelter for families",
+    "EarlyON centres near me",
+    "Family centre with Mandarin speaking staff",
+    "Child and family centre with French language programs",
+    "Indigenous programs for children",
+    "Shelter and an EarlyON centre for my kids",
+    "Chinese speaking family centre",
+    "Where can I get help with housing",
+    "Best pizza downtown",
+]
+
+
+def _configure_environment(args, ckan_url: str, data_dir: str):
+    # Must run before any agent_flow import reads the environment
+    os.environ["CKAN_BASE_URL"] = ckan_url
+    os.environ["MIRROR_DB_PATH"] = os.path.join(data_dir, "mirror.sqlite3")
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("GOOGLE_MAPS_API_KEY", "AIzaBenchmark")
+    os.environ.setdefault("LOG_LEVEL", "DEBUG" if args.verbose else "WARNING")
+    os.environ.setdefault("LOG_FORMAT", "text")
+    if args.speculative:
+        os.environ["SPECULATIVE_EXECUTION"] = "1"
+
+
+def _install_fakes(args) -> StubGoogleMaps:
+    from agent_flow.log import configure_logging
+
+    configure_logging()
+
+    import agent_flow.helpers
+    import agent_flow.places
+    import agent_flow.registry as registry_module
+
+    maps = StubGoogleMaps(latency=args.google_latency)
+    agent_flow.helpers.gmaps = maps
+    agent_flow.places.gmaps = maps
+
+    model = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+
+    class BenchmarkRegistry(registry_module.Registry):
+        def model(self, name=registry_module.DEFAULT_MODEL, temperature=0):
+            return model
+
+    registry_module._registry = BenchmarkRegistry()
+    registry_module._registry.build_all()
+    return maps
+
+
+def _percentiles(latencies):
+    values = np.array(latencies) if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "mean": float(values.mean()),
+        "max": float(values.max()),
+    }
+
+
+async def _run(args, maps: StubGoogleMaps):
+    from agent_flow.cache import cache, redis_cache
+    from agent_flow.graph import app
+    from agent_flow.http_client import close_http_client
+    from agent_flow.log import bind_request_id
+    from agent_flow.metrics import dependency_latency, node_latency
+    from agent_flow.executor import run_blocking
+    from agent_flow.mirror import sync_all
+    from agent_flow.prompt_format import load_token_encoder
+    from agent_flow.spatial_index import build_spatial_index
+
+    await run_blocking(load_token_encoder)
+    if args.redis and not await redis_cache.connect():
+        sys.exit("Could not connect to Redis; check REDIS_HOST / REDIS_PORT.")
+
+    if args.mirror:
+        await sync_all(on_synced=build_spatial_index)
+
+    rng = random.Random(args.seed)
+    jobs = [
+        (rng.choice(QUERIES), seeded_location(rng))
+        for _ in range(args.warmup + args.requests)
+    ]
+    warmup, measured = jobs[: args.warmup], jobs[args.warmup :]
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(query, location, record: bool):
+        nonlocal errors
+        async with semaphore:
+            bind_request_id()
+            start = time.perf_counter()
+            try:
+                await app.ainvoke({"query": query, "users_location": location})
+            except Exception as e:
+                errors += 1
+                print(f"Request failed ({query!r}): {e}", file=sys.stderr)
+                return
+            if record:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(q, loc, False) for q, loc in warmup))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(q, loc, True) for q, loc in measured))
+    elapsed = time.perf_counter() - started
+
+    await close_http_client()
+    await redis_cache.close()
+
+    return {
+        "requests": len(measured),
+        "errors": errors,
+        "concurrency": args.concurrency,
+        "seconds": elapsed,
+        "throughput_rps": len(measured) / elapsed if elapsed else 0.0,
+        "latency_seconds": _percentiles(latencies),
+        "nodes": {
+            labels[0]: {**stats, "mean": stats["sum"] / stats["count"]}
+            for labels, stats in node_latency.snapshot().items()
+            if stats["count"]
+        },
+        "dependencies": {
+            "/".join(labels): stats
+            for labels, stats in dependency_latency.snapshot().items()
+        },
+        "google_calls": dict(maps.calls),
+        "cache": cache.stats(),
+    }
+
+
+def _print_report(report):
+    latency = report["latency_seconds"]
+    print()
+    print(
+        f"{report['requests']} requests, {report['errors']} errors, "
+        f"concurrency {report['concurrency']}, {report['seconds']:.2f}s"
+    )
+    print(f"throughput: {report['throughput_rps']:.2f} req/s")
+    print(
+        "latency: "
+        + ", ".join(f"{name} {value * 1000:.0f}ms" for name, value in latency.items())
+    )
+    print("per node (mean):")
+    for node, stats in sorted(report["nodes"].items()):
+        print(f"  {node:<20} {stats['mean'] * 1000:8.0f}ms  x{stats['count']:.0f}")
+    print("dependency calls:")
+    for dependency, stats in sorted(report["dependencies"].items()):
+        print(f"  {dependency:<20} {stats['count']:8.0f}")
+    print(f"google calls: {report['google_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.01)
+    parser.add_argument("--ckan-latency", type=float, default=0.05)
+    parser.add_argument("--google-latency", type=float, default=0.05)
+    parser.add_argument("--shelters", type=int, default=300)
+    parser.add_argument("--family-centres", type=int, default=150)
+    parser.add_argument(
+        "--mirror",
+        action="store_true",
+        help="sync the local mirror and spatial index from the stub first",
+    )
+    parser.add_argument(
+        "--redis", action="store_true", help="use Redis from REDIS_* settings"
+    )
+    parser.add_argument(
+        "--speculative", action="store_true", help="set SPECULATIVE_EXECUTION=1"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="show the application's debug logs"
+    )
+    parser.add_argument("--output", help="also write the report as JSON here")
+    args = parser.parse_args()
+
+    ckan = StubCkanServer(
+        {
+            SHELTER_PACKAGE_ID: shelter_records(args.shelters),
+            FAMILY_CENTRE_PACKAGE_ID: family_centre_records(args.family_centres),
+        },
+        latency=args.ckan_latency,
+    ).start()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        _configure_environment(args, ckan.url, data_dir)
+        maps = _install_fakes(args)
+        try:
+            report = asyncio.run(_run(args, maps))
+        finally:
+            ckan.stop()
+        report["ckan_requests"] = ckan.requests
+
+    _print_report(report)
+    print(f"ckan requests: {report['ckan_requests']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Local stand-ins for the services the graph talks to, for offline benchmarks.
+
+- FakeChatModel: answers each prompt of the pipeline with a plausible
+  response after a configurable delay, streaming its output token by token.
+- StubCkanServer: a threaded HTTP server implementing the two CKAN actions
+  the code uses (package_show, datastore_search) over synthetic datasets.
+- StubGoogleMaps: deterministic geocode / places / place responses.
+
+Nothing here imports agent_flow, so the environment can be set up before the
+application modules read it.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Downtown Toronto and roughly the city's extent
+TORONTO_LAT, TORONTO_LNG = 43.6532, -79.3832
+LAT_SPAN, LNG_SPAN = 0.15, 0.25
+
+SHELTER_PACKAGE_ID = "daily-shelter-overnight-service-occupancy-capacity"
+FAMILY_CENTRE_PACKAGE_ID = "earlyon-child-and-family-centres"
+
+STREETS = ["King", "Queen", "Dundas", "College", "Bloor", "Yonge", "Bathurst",
+           "Spadina", "Jarvis", "Sherbourne", "Parliament", "Danforth"]  # fmt: skip
+SECTORS = ["Families", "Mixed Adult", "Men", "Women", "Youth"]
+SERVICE_TYPES = ["Shelter", "Motel/Hotel Shelter", "24-Hour Respite Site"]
+LANGUAGES = ["Arabic", "Cantonese", "Mandarin", "Spanish", "Tamil", "Urdu",
+             "Portuguese", "Somali", "Tagalog (Pilipino, Filipino)", "French"]  # fmt: skip
+
+
+def _address(rng: random.Random) -> str:
+    return f"{rng.randint(1, 2000)} {rng.choice(STREETS)} St, Toronto, ON"
+
+
+def shelter_records(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "_id": i + 1,
+            "OCCUPANCY_DATE": "2026-01-01",
+            "LOCATION_NAME": f"Shelter {i + 1}",
+            "LOCATION_ADDRESS": _address(rng),
+            "LOCATION_CITY": "Toronto",
+            "SECTOR": rng.choice(SECTORS),
+            "OVERNIGHT_SERVICE_TYPE": rng.choice(SERVICE_TYPES),
+            "PROGRAM_MODEL": rng.choice(["Emergency", "Transitional"]),
+            "OCCUPANCY_RATE_ROOMS": round(rng.uniform(60, 100), 2),
+        }
+        for i in range(n)
+    ]
+
+
+def family_centre_records(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "_id": i + 1,
+            "program_name": f"EarlyON Centre {i + 1}",
+            "full_address": _address(rng),
+            "website": f"https://earlyon.example.org/{i + 1}",
+            "phone": f"416-555-{i:04d}",
+            "email": f"centre{i + 1}@example.org",
+            "languages": "; ".join(rng.sample(LANGUAGES, rng.randint(0, 3))),
+            "french_language_program": rng.choice(["Yes", "No", "No", "No"]),
+            "indigenous_program": rng.choice(["Yes", "No", "No", "No"]),
+        }
+        for i in range(n)
+    ]
+
+
+class StubCkanServer:
+    """
+    Serves package_show and datastore_search for in-memory datasets.
+
+    Supports the `filters` (exact match), `q` (case-insensitive, OR-separated
+    terms), `limit` and `offset` parameters the application sends.
+    """
+
+    def __init__(self, datasets: Dict[str, List[Dict[str, Any]]], latency: float = 0.0):
+        self.datasets = datasets
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubCkanServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _package_show(self, params) -> Dict[str, Any]:
+        package_id = params.get("id", "")
+        if package_id not in self.datasets:
+            return {"success": False, "error": {"message": "Not found"}}
+        resource = {
+            "id": f"resource-{package_id}",
+            "datastore_active": True,
+            "last_modified": "2026-01-01T00:00:00",
+        }
+        return {
+            "success": True,
+            "result": {
+                "metadata_modified": "2026-01-01T00:00:00",
+                "resources": [resource],
+            },
+        }
+
+    def _datastore_search(self, params) -> Dict[str, Any]:
+        package_id = params.get("id", "").removeprefix("resource-")
+        records = self.datasets.get(package_id, [])
+
+        filters = json.loads(params["filters"]) if params.get("filters") else {}
+        if filters:
+            records = [
+                r
+                for r in records
+                if all(str(r.get(k)) == str(v) for k, v in filters.items())
+            ]
+
+        if params.get("q"):
+            terms = [t.strip().lower() for t in params["q"].split(" OR ")]
+            records = [
+                r
+                for r in records
+                if any(t in json.dumps(r).lower() for t in terms if t)
+            ]
+
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        return {
+            "success": True,
+            "result": {
+                "records": records[offset : offset + limit],
+                "total": len(records),
+            },
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                parsed = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                if parsed.path.endswith("/package_show"):
+                    body = stub._package_show(params)
+                elif parsed.path.endswith("/datastore_search"):
+                    body = stub._datastore_search(params)
+                else:
+                    self.send_error(404)
+                    return
+
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class StubGoogleMaps:
+    """Drop-in for the googlemaps.Client methods the application calls."""
+
+    def __init__(self, latency: float = 0.0, places_per_search: int = 10):
+        self.latency = latency
+        self.places_per_search = places_per_search
+        self.calls = {"geocode": 0, "places": 0, "place": 0}
+        self._lock = threading.Lock()
+
+    def _call(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _coordinates(text: str) -> Dict[str, float]:
+        digest = hashlib.sha256(text.encode()).digest()
+        x = int.from_bytes(digest[:4], "big") / 2**32 - 0.5
+        y = int.from_bytes(digest[4:8], "big") / 2**32 - 0.5
+        return {"lat": TORONTO_LAT + x * LAT_SPAN, "lng": TORONTO_LNG + y * LNG_SPAN}
+
+    def geocode(self, address: str, **kwargs) -> List[Dict[str, Any]]:
+        self._call("geocode")
+        return [{"geometry": {"location": self._coordinates(address)}}]
+
+    def places(self, query: str, **kwargs) -> Dict[str, Any]:
+        self._call("places")
+        prefix = hashlib.sha256(query.encode()).hexdigest()[:8]
+        return {
+            "results": [
+                {
+                    "place_id": f"{prefix}-{i}",
+                    "name": f"{query.title()} {i + 1}",
+                    "formatted_address": f"{100 + i} Queen St W, Toronto, ON",
+                    "rating": 4.0,
+                }
+                for i in range(self.places_per_search)
+            ]
+        }
+
+    def place(self, place_id: str, fields=None, **kwargs) -> Dict[str, Any]:
+        self._call("place")
+        return {
+            "result": {
+                "name": f"Place {place_id}",
+                "formatted_phone_number": "(416) 555-0100",
+                "website": f"https://places.example.org/{place_id}",
+                "url": f"https://maps.example.org/?cid={place_id}",
+                "formatted_address": "100 Queen St W, Toronto, ON",
+            }
+        }
+
+
+SHELTER_WORDS = ("shelter", "homeless", "respite", "bed", "sleep")
+FAMILY_CENTRE_WORDS = ("earlyon", "family", "child", "kid", "parent", "toddler")
+COMMERCIAL_WORDS = ("pizza", "restaurant", "hotel", "movie", "mall", "spa")
+
+FEEDBACK = (
+    "These locations are the closest matches to your request. Call ahead to "
+    "confirm availability and hours, as capacity and schedules can change "
+    "during the day. Most programs are free and do not require a referral."
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Stand-in for ChatOpenAI that recognises each prompt in the pipeline.
+
+    Every call waits `latency` seconds (time to first token) plus
+    `token_latency` per output token, roughly like a hosted model.
+    """
+
+    latency: float = 0.5
+    token_latency: float = 0.01
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    @staticmethod
+    def _user_query(messages: List[BaseMessage]) -> str:
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                return str(message.content)
+        return ""
+
+    def _tool_calls(self, query: str, tools: List[Dict[str, Any]]) -> AIMessage:
+        names = {tool["function"]["name"] for tool in tools}
+        wanted = []
+        lowered = query.lower()
+        if any(word in lowered for word in SHELTER_WORDS):
+            wanted.append("retrieve_shelters")
+        if any(word in lowered for word in FAMILY_CENTRE_WORDS):
+            wanted.append("retrieve_children_family_centers")
+        wanted = [name for name in wanted if name in names] or sorted(names)[:1]
+        return AIMessage(
+            "",
+            tool_calls=[
+                {
+                    "name": name,
+                    "args": {"user_query": query},
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "tool_call",
+                }
+                for name in wanted
+            ],
+        )
+
+    @staticmethod
+    def _response_from_tables(prompt: str) -> str:
+        addresses = []
+        for block in prompt.split("\n\n"):
+            lines = [line for line in block.splitlines() if " | " in line]
+            for row in lines[1:]:  # skip the header row
+                cells = [cell.strip() for cell in row.split(" | ")]
+                addresses.append(
+                    {
+                        "address": " - ".join(cells[:2]),
+                        "phone": next((c for c in cells if re.match(r"\d{3}-", c)), ""),
+                        "email": next((c for c in cells if "@" in c), ""),
+                        "website": next((c for c in cells if c.startswith("http")), ""),
+                    }
+                )
+        return json.dumps({"addresses": addresses[:6], "feedback": FEEDBACK})
+
+    def _respond(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        prompt = "\n".join(str(m.content) for m in messages)
+        query = self._user_query(messages)
+
+        if kwargs.get("tools"):
+            if isinstance(messages[-1], ToolMessage):
+                return AIMessage("I found matching resources.")
+            return self._tool_calls(query, kwargs["tools"])
+
+        if "Answer: VALID or INVALID" in prompt:
+            lowered = prompt.lower()
+            invalid = any(word in lowered for word in COMMERCIAL_WORDS)
+            return AIMessage("INVALID" if invalid else "VALID")
+        if "'SECTOR', 'OVERNIGHT_SERVICE_TYPE'" in prompt:
+            sector = next(
+                (
+                    s
+                    for s in SECTORS
+                    if s.lower() in prompt.split("User query:")[-1].lower()
+                ),
+                "",
+            )
+            return AIMessage(
+                json.dumps({"SECTOR": sector, "OVERNIGHT_SERVICE_TYPE": ""})
+            )
+        if "'french_language_program', 'indigenous_program', 'languages'" in prompt:
+            return AIMessage(
+                json.dumps(
+                    {
+                        "french_language_program": "",
+                        "indigenous_program": "",
+                        "languages": "",
+                    }
+                )
+            )
+        if "should_google" in prompt:
+            return AIMessage(
+                json.dumps({"should_google": False, "is_high_occupancy": False})
+            )
+        if "google maps search query" in prompt:
+            return AIMessage(f"{query} Toronto")
+        if "Retrieved results" in prompt:
+            return AIMessage(self._response_from_tables(prompt))
+        return AIMessage("OK")
+
+    def _delay(self, message: AIMessage) -> float:
+        tokens = max(1, len(str(message.content)) // 4)
+        return self.latency + self.token_latency * tokens
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._respond(messages, **kwargs)
+        time.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._respond(messages, **kwargs)
+        await asyncio.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._respond(messages, **kwargs)
+        await asyncio.sleep(self.latency)
+
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": i,
+                        }
+                        for i, call in enumerate(message.tool_calls)
+                    ],
+                )
+            )
+            return
+
+        content = str(message.content)
+        for start in range(0, len(content), 4):
+            await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=content[start : start + 4])
+            )
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def seeded_location(rng: random.Random) -> Optional[Dict[str, float]]:
+    """A user location somewhere in Toronto (or none, now and then)."""
+    if rng.random() < 0.1:
+        return {}
+    return {
+        "lat": TORONTO_LAT + rng.uniform(-0.5, 0.5) * LAT_SPAN,
+        "lng": TORONTO_LNG + rng.uniform(-0.5, 0.5) * LNG_SPAN,
+    }
@@ -0,0 +1,124 @@
+"""
+Parity check between the local EarlyON filter extractor and the LLM extraction.
+
+Each case pairs a query with the filter the LLM chain is expected to return.
+By default the local extractor is checked against those expectations; with
+--live the same queries are also sent to the LLM chain (needs OPENAI_API_KEY)
+and its answers are compared with the extractor's.
+
+    python -m benchmarks.family_center_filter_parity [--live]
+"""
+
+import argparse
+import asyncio
+import sys
+from agent_flow.tools.language_extraction import extract_family_center_filter
+
+# (query, expected french_language_program, indigenous_program, languages)
+PARITY_CASES = [
+    ("Family centres near me", "", "", ""),
+    ("EarlyON centres in Scarborough", "", "", ""),
+    ("Child care centre that speaks English", "", "", ""),
+    ("Family centre with Mandarin speaking staff", "", "", "Mandarin"),
+    ("Cantonese playgroups for toddlers", "", "", "Cantonese"),
+    ("Children's centre where they speak Punjabi", "", "", "Panjabi (Punjabi)"),
+    ("Programs in Panjabi", "", "", "Panjabi (Punjabi)"),
+    ("Farsi speaking family centre", "", "", "Persian (Farsi)"),
+    ("Persian language support for parents", "", "", "Persian (Farsi)"),
+    ("Filipino family drop-in", "", "", "Tagalog (Pilipino, Filipino)"),
+    ("Tagalog speaking EarlyON", "", "", "Tagalog (Pilipino, Filipino)"),
+    ("Centre for Twi speaking families", "", "", "Akan (Twi)"),
+    ("Arabic and Urdu family programs", "", "", "Arabic; Urdu"),
+    (
+        "Spanish, Portuguese or Italian speaking staff",
+        "",
+        "",
+        "Spanish; Portuguese; Italian",
+    ),
+    ("Somali family centre", "", "", "Somali"),
+    ("Tamil speaking child centre in Markham", "", "", "Tamil"),
+    ("Bengali or Hindi family centre", "", "", "Bengali; Hindi"),
+    ("Vietnamese parenting classes", "", "", "Vietnamese"),
+    ("Korean and Japanese family programs", "", "", "Korean; Japanese"),
+    ("Russian speaking EarlyON", "", "", "Russian"),
+    ("Dari and Pashto speaking staff", "", "", "Dari; Pashto"),
+    ("Family centre that speaks Gujarati", "", "", "Gujarati"),
+    ("German language family centre", "", "", "German"),
+    ("Edo speaking family support", "", "", "Edo"),
+    ("Centres with French language programs", "Yes", "", ""),
+    ("Francophone family centre", "Yes", "", ""),
+    ("Family centre where staff speak French", "", "", "French"),
+    ("Indigenous programs for children", "", "Yes", ""),
+    ("First Nations family centre", "", "Yes", ""),
+    ("Programs for Métis and Inuit families", "", "Yes", ""),
+    ("Indigenous family centre with French programs", "Yes", "Yes", ""),
+    ("Arabic speaking centre with Indigenous programs", "", "Yes", "Arabic"),
+    ("Arabic-speaking family centre", "", "", "Arabic"),
+    ("Mandarin-speaking staff", "", "", "Mandarin"),
+    ("Spanish-speaking daycare", "", "", "Spanish"),
+    ("Cantonese-speaking EarlyON", "", "", "Cantonese"),
+    ("Tamil-speaking staff", "", "", "Tamil"),
+    ("Somali-language drop-in", "", "", "Somali"),
+    ("Indigenous-led family programs", "", "Yes", ""),
+]
+
+# Queries the extractor must hand to the LLM
+AMBIGUOUS_CASES = [
+    "Chinese speaking family centre",
+    "French family centre",
+    "Native family programs",
+]
+
+
+async def _llm_filters(queries):
+    from agent_flow.registry import get_registry
+
+    chain = get_registry()["family_center_filter"]
+    return await asyncio.gather(*(chain.ainvoke({"query": q}) for q in queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="also compare with the LLM")
+    args = parser.parse_args()
+
+    failures = 0
+    for query, french, indigenous, languages in PARITY_CASES:
+        extracted = extract_family_center_filter(query)
+        expected = (french, indigenous, languages)
+        got = extracted and (
+            extracted.french_language_program,
+            extracted.indigenous_program,
+            extracted.languages,
+        )
+        if got != expected:
+            failures += 1
+            print(f"MISMATCH {query!r}: expected {expected}, got {got}")
+
+    for query in AMBIGUOUS_CASES:
+        if extract_family_center_filter(query) is not None:
+            failures += 1
+            print(f"NOT ESCALATED {query!r}")
+
+    total = len(PARITY_CASES) + len(AMBIGUOUS_CASES)
+    print(f"Extractor: {total - failures}/{total} cases match")
+
+    if args.live:
+        queries = [case[0] for case in PARITY_CASES]
+        llm_outputs = asyncio.run(_llm_filters(queries))
+        agree = 0
+        for query, llm in zip(queries, llm_outputs):
+            local = extract_family_center_filter(query)
+            if local.model_dump() == llm.model_dump():
+                agree += 1
+            else:
+                print(
+                    f"LLM DIFFERS {query!r}: local {local.model_dump()}, llm {llm.model_dump()}"
+                )
+        print(f"LLM parity: {agree}/{len(queries)} cases agree")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
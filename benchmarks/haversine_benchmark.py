@@ -0,0 +1,88 @@
+"""
+Compare the per-record haversine loop with the vectorized batch API.
+
+Run from the repository root:
+
+    python -m benchmarks.haversine_benchmark [--repeat 5] [--limit 5]
+"""
+
+import argparse
+import random
+import timeit
+import numpy as np
+from agent_flow.distance import haversine_distance, haversine_distances, nearest_indices
+
+# Downtown Toronto
+USER_LAT, USER_LNG = 43.6532, -79.3832
+SIZES = [1_000, 10_000, 100_000]
+
+
+def synthetic_records(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "lat": USER_LAT + rng.uniform(-0.3, 0.3),
+            "lng": USER_LNG + rng.uniform(-0.4, 0.4),
+        }
+        for _ in range(n)
+    ]
+
+
+def per_record_loop(records: list[dict], limit: int) -> list[dict]:
+    """The previous filter_results_by_proximity ranking: one call per record, then a full sort."""
+    with_distance = [
+        (haversine_distance(USER_LAT, USER_LNG, r["lat"], r["lng"]), r) for r in records
+    ]
+    with_distance.sort(key=lambda x: x[0])
+    return [r for _, r in with_distance[:limit]]
+
+
+def batch_from_records(records: list[dict], limit: int) -> list[dict]:
+    lats = np.fromiter(
+        (r["lat"] for r in records), dtype=np.float64, count=len(records)
+    )
+    lngs = np.fromiter(
+        (r["lng"] for r in records), dtype=np.float64, count=len(records)
+    )
+    distances = haversine_distances(USER_LAT, USER_LNG, lats, lngs)
+    return [records[i] for i in nearest_indices(distances, limit)]
+
+
+def batch_from_arrays(lats: np.ndarray, lngs: np.ndarray, limit: int) -> np.ndarray:
+    return nearest_indices(haversine_distances(USER_LAT, USER_LNG, lats, lngs), limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    print(
+        f"{'points':>8} {'loop ms':>10} {'batch ms':>10} {'arrays ms':>10} {'speedup':>8}"
+    )
+    for n in SIZES:
+        records = synthetic_records(n)
+        lats = np.array([r["lat"] for r in records])
+        lngs = np.array([r["lng"] for r in records])
+
+        # Both paths must pick the same records
+        assert per_record_loop(records, args.limit) == batch_from_records(
+            records, args.limit
+        )
+
+        def best_ms(fn) -> float:
+            return min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1000
+
+        loop_ms = best_ms(lambda: per_record_loop(records, args.limit))
+        batch_ms = best_ms(lambda: batch_from_records(records, args.limit))
+        arrays_ms = best_ms(lambda: batch_from_arrays(lats, lngs, args.limit))
+
+        print(
+            f"{n:>8} {loop_ms:>10.2f} {batch_ms:>10.2f} {arrays_ms:>10.2f} "
+            f"{loop_ms / arrays_ms:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
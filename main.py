@@ -1,89 +1,218 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 import asyncio
+import logging
 import socketio
-from agent_flow.graph import app
-import json
-from utils.socket_context import SocketIOContext
+from agent_flow.log import configure_logging
 
-sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+# Before the agent_flow imports below, some of which log as they load
+configure_logging()
 
-fastapi_app = FastAPI()
+from agent_flow.graph import app
+from agent_flow.job_queue import GRAPH_QUEUE_MODE, cancel_job, enqueue_job
+from agent_flow.cache import cache, redis_cache
+from agent_flow.executor import run_blocking, shutdown_executor
+from agent_flow.http_client import close_http_client
+from agent_flow.registry import close_registry, get_registry
+from agent_flow.metrics import metrics, queries_total, socketio_connections
+from agent_flow.pipeline import answer_query
+from agent_flow.mirror import MIRROR_SYNC_INTERVAL_SECONDS, run_periodic_sync
+from agent_flow.prompt_format import load_token_encoder, prompt_stats
+from agent_flow.query_classifier import classifier_stats, query_priority
+from agent_flow.scheduler import AdmissionScheduler, Job
+from agent_flow.result_checks import evaluation_stats
+from agent_flow.speculation import speculation_stats
+from agent_flow.spatial_index import build_spatial_index
+from typing import Dict
+from utils.socket_context import create_client_manager
+
+logger = logging.getLogger(__name__)
+
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="*",
+    client_manager=create_client_manager(),
+)
+scheduler = AdmissionScheduler()
+
+# The latest query of each client, queued or running
+active_jobs: Dict[str, Job] = {}
+# The same in GRAPH_QUEUE_MODE, as job ids on the Redis queue
+queued_job_ids: Dict[str, str] = {}
+
+BUSY_MESSAGE = "We're helping a lot of people right now. Please try again in a minute."
+QUEUE_ERROR_MESSAGE = "Something went wrong on our side. Please try again in a moment."
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    get_registry()
+    await run_blocking(load_token_encoder)
+    if not await redis_cache.connect() and GRAPH_QUEUE_MODE:
+        raise RuntimeError(
+            "GRAPH_QUEUE_MODE needs Redis; set REDIS_HOST and REDIS_PORT."
+        )
 
-app_asgi = socketio.ASGIApp(sio, fastapi_app)
+    mirror_task = None
+    # In queue mode the workers run the graph and keep their own mirror
+    if MIRROR_SYNC_INTERVAL_SECONDS > 0 and not GRAPH_QUEUE_MODE:
+        mirror_task = asyncio.create_task(
+            run_periodic_sync(on_synced=build_spatial_index)
+        )
 
+    yield
 
-@sio.event
-async def connect(sid, environ):
-    print("Client connected:", sid)
+    if mirror_task:
+        mirror_task.cancel()
+    await close_http_client()
+    await close_registry()
+    await redis_cache.close()
+    shutdown_executor()
 
 
-@sio.event
-async def disconnect(sid):
-    print("Client disconnected:", sid)
+fastapi_app = FastAPI(lifespan=lifespan)
 
+app_asgi = socketio.ASGIApp(sio, fastapi_app)
 
-@sio.event
-async def on_submit_query(sid, data):
-    print("Received query:", sid, data)
-    query = data.get("query")
-    users_location = data.get("location")
 
-    asyncio.create_task(stream_data(sid, query, users_location))
+def cache_stats():
+    stats = cache.stats()
+    for counters in stats.values():
+        # negative_hits are already counted in local_hits / redis_hits
+        hits = counters.get("local_hits", 0) + counters.get("redis_hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        counters["hit_ratio"] = hits / lookups if lookups else 0.0
+    return stats
+
+
+metrics.register_snapshot(
+    "carebridge_cache", "Tiered cache counters.", cache_stats, label="namespace"
+)
+metrics.register_snapshot(
+    "carebridge_query_validation",
+    "Query validations decided locally vs by the LLM.",
+    classifier_stats.snapshot,
+)
+metrics.register_snapshot(
+    "carebridge_evaluation",
+    "Result evaluations decided locally vs by the LLM.",
+    evaluation_stats.snapshot,
+)
+metrics.register_snapshot(
+    "carebridge_speculation",
+    "Speculative branch outcomes.",
+    speculation_stats.snapshot,
+    label="branch",
+)
+metrics.register_snapshot(
+    "carebridge_prompt",
+    "Prompt token usage for serialized results.",
+    prompt_stats.snapshot,
+    label="node",
+)
+
+
+@fastapi_app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
 
 
-async def stream_data(sid, query, location):
-    print("stream_data called")
-    print(query, location)
+@sio.event
+async def connect(sid, environ):
+    logger.debug("Client connected", extra={"sid": sid})
+    socketio_connections.inc()
 
-    SocketIOContext.set_context(sio, sid)
 
-    try:
-        async for chunk in app.astream(
-            {"query": query, "users_location": location}, stream_mode="updates"
-        ):
-            curr_chunk = chunk
-            first_key = list(curr_chunk.keys())[0]
+@sio.event
+async def disconnect(sid):
+    logger.debug("Client disconnected", extra={"sid": sid})
+    socketio_connections.dec()
+    await cancel_active_job(sid, "disconnect")
 
-            # await sio.emit("update", {"message": f"finished {first_key}"}, room=sid)
 
-            if first_key == "generate":
-                if "error_response" in curr_chunk[first_key]:
-                    error_response = curr_chunk[first_key]["error_response"]
-                    print("Error response:", error_response)
+async def cancel_active_job(sid: str, reason: str):
+    """Stop the client's previous query; nobody will read its answer."""
+    job_id = queued_job_ids.pop(sid, None)
+    if job_id is not None:
+        try:
+            await cancel_job(job_id, reason)
+        except Exception as e:
+            logger.warning("Error cancelling job %s: %s", job_id, e)
 
-                    await sio.emit(
-                        "final_res",
-                        {"message": "", "error_msg": error_response},
-                        room=sid,
-                    )
-                    return
+    job = active_jobs.pop(sid, None)
+    if job is not None:
+        stage = scheduler.cancel(job, reason)
+        if stage:
+            logger.info("Cancelled %s query (%s)", stage, reason, extra={"sid": sid})
 
-                structured_response = curr_chunk[first_key]["structured_response"]
 
-                print("structured_response", structured_response)
+async def send_busy(sid: str):
+    logger.warning("Queue full, turning away query", extra={"sid": sid})
+    queries_total.inc("busy")
+    await sio.emit(
+        "final_res",
+        {"message": "", "error_msg": BUSY_MESSAGE, "busy": True},
+        room=sid,
+    )
 
-                if hasattr(structured_response, "dict"):
-                    response_dict = structured_response.dict()
-                elif hasattr(structured_response, "to_dict"):
-                    response_dict = structured_response.to_dict()
-                else:
-                    response_dict = vars(structured_response)
 
-                await sio.emit(
-                    "final_res",
-                    {"message": json.dumps(response_dict)},
-                    room=sid,
-                )
+@sio.event
+async def on_submit_query(sid, data):
+    logger.debug("Received query", extra={"sid": sid})
+    query = data.get("query")
+    users_location = data.get("location")
 
-    except Exception as e:
-        await SocketIOContext.emit("error", {"message": str(e)})
-        print(f"Error in stream_data: {e}")
+    await cancel_active_job(sid, "superseded")
+
+    if GRAPH_QUEUE_MODE:
+        try:
+            job_id = await enqueue_job(
+                sid, query, users_location, query_priority(query)
+            )
+        except Exception as e:
+            logger.error("Could not queue query: %s", e, extra={"sid": sid})
+            queries_total.inc("error")
+            await sio.emit(
+                "final_res",
+                {"message": "", "error_msg": QUEUE_ERROR_MESSAGE},
+                room=sid,
+            )
+            return
+        if job_id is None:
+            await send_busy(sid)
+        else:
+            queued_job_ids[sid] = job_id
+        return
+
+    async def send_position(position: int):
         await sio.emit(
-            "final_res",
-            {"message": "", "error_msg": str(e)},
+            "update",
+            {
+                "message": f"Waiting in line (position {position})",
+                "queue_position": position,
+            },
             room=sid,
         )
 
+    async def run():
+        try:
+            await answer_query(sio, sid, query, users_location)
+        finally:
+            if active_jobs.get(sid) is job:
+                del active_jobs[sid]
+
+    job = scheduler.submit(
+        run, priority=query_priority(query), on_position=send_position
+    )
+
+    if job is not None:
+        active_jobs[sid] = job
+    else:
+        await send_busy(sid)
+
 
 async def debug_graph():
     test_query = "Find me child care centers in the area"
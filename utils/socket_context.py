@@ -1,9 +1,37 @@
+import logging
+import os
 from contextvars import ContextVar
 from typing import Optional
 import socketio
+from agent_flow.cache import redis_url
+
+# Instances sharing a channel deliver each other's emits
+SOCKETIO_REDIS_CHANNEL = os.getenv("SOCKETIO_REDIS_CHANNEL", "carebridge-socketio")
+
+logger = logging.getLogger(__name__)
+
+_sio_instance: ContextVar[Optional[socketio.AsyncServer]] = ContextVar(
+    "sio_instance", default=None
+)
+_session_id: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+
+def create_client_manager(
+    write_only: bool = False,
+) -> Optional[socketio.AsyncRedisManager]:
+    """
+    Redis-backed Socket.IO client manager, so an emit reaches the client
+    whichever instance it is connected to. Returns None (in-process manager)
+    when Redis is not configured.
+    """
+    url = redis_url()
+    if not url:
+        logger.info("Redis not configured; Socket.IO events stay within this process.")
+        return None
+    return socketio.AsyncRedisManager(
+        url, channel=SOCKETIO_REDIS_CHANNEL, write_only=write_only
+    )
 
-_sio_instance: ContextVar[Optional[socketio.AsyncServer]] = ContextVar('sio_instance', default=None)
-_session_id: ContextVar[Optional[str]] = ContextVar('session_id', default=None)
 
 class SocketIOContext:
     @staticmethod
@@ -11,15 +39,15 @@ class SocketIOContext:
         """Set the Socket.IO context for the current task"""
         _sio_instance.set(sio)
         _session_id.set(sid)
-    
+
     @staticmethod
     def get_context() -> tuple[Optional[socketio.AsyncServer], Optional[str]]:
         """Get the current Socket.IO context"""
         return _sio_instance.get(), _session_id.get()
-    
+
     @staticmethod
     async def emit(event: str, data: dict, **kwargs):
         """Emit an event using the current context"""
         sio, sid = SocketIOContext.get_context()
         if sio and sid:
-            await sio.emit(event, data, room=sid, **kwargs)
\ No newline at end of file
+            await sio.emit(event, data, room=sid, **kwargs)